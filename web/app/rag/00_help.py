@@ -19,6 +19,11 @@ Les variables suivantes peuvent être configurées dans votre environnement :
 - WEAVIATE_GRPC_PORT=50051 (défaut)
 - WEAVIATE_DEFAULT_COLLECTION="NewCollection" (défaut)
 - OPENAI_API_KEY=sk-xxxx (requis)
+- EMBEDDING_CACHE=1 (défaut, 0 pour désactiver le cache d'embeddings)
+- EMBEDDING_CACHE_PATH=rag/.cache/embeddings.sqlite3 (défaut)
+- EMBEDDING_CACHE_MAX_MB=512 (défaut, éviction des moins récemment utilisés au-delà)
+- ANSWER_CACHE=1 (défaut, 0 pour désactiver le cache de réponses)
+- ANSWER_CACHE_TTL=3600, ANSWER_CACHE_MAX_ENTRIES=1000, ANSWER_CACHE_SIMILARITY=0.95
 
 📋 INSTRUCTIONS D'UTILISATION :
 
@@ -28,6 +33,11 @@ Les variables suivantes peuvent être configurées dans votre environnement :
    Exemples :
    python 01_create_schema.py                    # Utilise la variable WEAVIATE_DEFAULT_COLLECTION
    python 01_create_schema.py CollectionName      # Crée la collection "CollectionName"
+   python 01_create_schema.py CollectionName --profile low-memory
+
+   Profils (--profile, env SCHEMA_PROFILE) : default, fast-ingest, high-recall, low-memory,
+   ou fichier YAML/JSON (HNSW, quantification PQ/BQ/SQ/RQ, BM25, tokenisation des propriétés).
+   --list-profiles affiche les réglages de chaque profil.
    
    Options disponibles si la collection existe déjà :
    - Supprimer et recréer la même collection
@@ -40,6 +50,45 @@ Les variables suivantes peuvent être configurées dans votre environnement :
    Exemples :
    python 02_ingest.py                    # Utilise "NewCollection" par défaut
    python 02_ingest.py CollectionName   # Utilise "CollectionName"
+   python 02_ingest.py CollectionName --batch-size 200 --max-tokens 100000
+
+   Options :
+   --batch-size N      Documents par requête d'embedding (défaut 100, env INGEST_BATCH_SIZE)
+   --max-tokens N      Budget de tokens par requête (défaut 250000, env INGEST_MAX_TOKENS)
+   --workers N         Workers d'embedding concurrents (défaut 4, env INGEST_WORKERS)
+   --rpm N / --tpm N   Quotas requêtes/min et tokens/min (env EMBEDDING_RPM / EMBEDDING_TPM)
+   --limit N           Lignes à lire, 0 = dataset complet (défaut 1000, env INGEST_LIMIT)
+   --split NOM         Split du dataset (défaut train)
+   --spec FICHIER      Source en YAML/JSON : source, split, fields, template (env INGEST_SPEC)
+   --source SRC        Dataset HuggingFace ou fichier .jsonl/.csv/.parquet
+   --field P=COL       Correspondance propriété=colonne (command et description obligatoires)
+   --template GABARIT  Texte vectorisé, ex. "{command}\\n{description}"
+   --chunk-tokens N    Découpe les descriptions en morceaux de N tokens (défaut 0 = non, env INGEST_CHUNK_TOKENS)
+   --chunk-overlap N   Chevauchement entre morceaux, en phrases entières (défaut 50)
+   --chunk-workers N   Processus de découpage (défaut : nombre de cœurs)
+   --write-batch-size N  Taille des lots d'écriture Weaviate (défaut 200)
+   --no-cache          Ignore le cache d'embeddings (une ré-ingestion identique ne fait aucun appel)
+   --full              Réécrit tout sans comparer à la collection
+   --keep-duplicates   Conserve les variantes d'une même commande
+   --delete-missing    Supprime les objets absents du dataset (avec --limit 0)
+   --resume            Reprend une ingestion interrompue après le dernier lot validé
+   --checkpoint-every N  Point de reprise tous les N lots (défaut 10)
+
+   L'ingestion est incrémentale : chaque objet reçoit un UUID dérivé de son contenu,
+   seuls les documents absents de la collection sont vectorisés et insérés.
+   Les commandes sont dédoublonnées par clé canonique (ls -l -a = ls -al) ; une description
+   modifiée remplace l'ancienne version de la commande.
+   Documents découpés : propriétés parent_id et chunk_index ; les morceaux consécutifs
+   d'un même document sont fusionnés à la requête.
+
+   Backend d'embedding : EMBEDDING_BACKEND=openai (défaut), local (sentence-transformers
+   sur CPU, sans réseau) ou hash (vecteurs déterministes pour les tests), --embedding-backend.
+   La signature backend:modèle:dimension est inscrite dans la collection : une requête
+   avec un autre backend est refusée.
+
+   Test sans clé OpenAI avec le serveur d'embedding factice :
+   python stub_embedding_server.py --rpm 60 &
+   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub python 02_ingest.py TestCollection
 
 3️⃣  Test en ligne de commande :
    python 03_query.py "question" [nom_collection]
@@ -47,6 +96,25 @@ Les variables suivantes peuvent être configurées dans votre environnement :
    Exemples :
    python 03_query.py "trouver les fichiers volumineux"
    python 03_query.py "voir les processus" CollectionName
+   python 03_query.py "voir les processus" --local   # Sans le service résident
+
+   03_query.py est un client léger du service 07_query_server.py (QUERY_SERVICE_URL,
+   défaut http://127.0.0.1:8000). Si le service est injoignable, la requête est
+   exécutée localement (démarrage plus lent). Le temps de démarrage du client est
+   comparé au budget QUERY_STARTUP_BUDGET_MS (défaut 200).
+   La durée de chaque étape (embed, search, dedupe, generate) est affichée.
+   Paramètres de recherche communs à 03 et 04 : RAG_ALPHA=0.5, RAG_LIMIT=6, RAG_TOP_K=4,
+   RAG_MMR_LAMBDA=0.5 (sélection MMR des sources, RAG_MMR=0 pour la désactiver)
+   Routage (RAG_ROUTER=1) : une question qui cite une commande (tar, rsync -av) passe
+   par BM25 seul sans embedding ; sans terme commun avec l'index, par le vecteur seul.
+   Vocabulaire du routeur construit à l'ingestion (rag/.cache/routers/<collection>.json).
+   Budget de contexte : RAG_CONTEXT_TOKENS=400 tokens (descriptions compressées au-delà de
+   RAG_DESCRIPTION_TOKENS=60), tokens du prompt affichés après la réponse.
+   Plusieurs collections : python 03_query.py "question" A,B (recherches parallèles,
+   fusion RRF, délai RAG_COLLECTION_TIMEOUT=2 s par collection, RAG_RRF_K=60).
+   Reclassement (RAG_RERANK=off|lexical|cross-encoder) : les candidats sont reclassés à la
+   place de MMR, dans le budget RAG_RERANK_BUDGET_MS=250 (repli lexical au-delà) ;
+   RAG_RERANK_TOP_K sources gardées (défaut RAG_TOP_K). pip install sentence-transformers.
 
 4️⃣  Interface web Gradio :
    python 04_gradio.py [nom_collection]
@@ -57,6 +125,17 @@ Les variables suivantes peuvent être configurées dans votre environnement :
    
    Accès : https://votre-domaine.com/rag
 
+   Chemin de requête asynchrone (client Weaviate async, aembed_query, ainvoke) :
+   GRADIO_CONCURRENCY=16 (requêtes simultanées), GRADIO_QUEUE_SIZE=100 (file d'attente)
+   Métriques Prometheus : http://localhost:7860/metrics (et /metrics du service 07) ;
+   traces par étape avec RAG_TRACING=log (JSON) ou otel (OpenTelemetry).
+   Test de charge sur backends factices : python load_test.py --users 1,10,50
+   LLM : LLM_BACKEND=openai (défaut), local (serveur compatible OpenAI, LLM_BASE_URL, défaut port 11434)
+   ou fake (réponses déterministes). Prompts identiques simultanés : un seul appel (LLM_COALESCE=1),
+   mesuré par python load_test.py --users 10 --same-question
+   La réponse est diffusée token par token ; les sources s'affichent dès la fin de la recherche.
+   La liste « Collections interrogées » permet de chercher dans plusieurs collections à la fois.
+
 5️⃣  Suppression de collection :
    python 05_delete_collection.py <nom_collection>
    
@@ -71,6 +150,35 @@ Les variables suivantes peuvent être configurées dans votre environnement :
    
    Affiche toutes les collections avec leurs statistiques
 
+7️⃣  Service de requêtes résident :
+   python 07_query_server.py [nom_collection]
+
+   Garde les clients OpenAI et Weaviate en mémoire entre les questions.
+   POST /query {"question": "...", "collection": "..."}, GET /health
+   Port : QUERY_SERVICE_PORT (défaut 8000)
+
+8️⃣  Index local (sans Weaviate) :
+   python 08_export_local_index.py [nom_collection]
+   RAG_INDEX=local python 03_query.py "question"    # ou : python 03_query.py "question" --index local
+   RAG_INDEX=local python 04_gradio.py
+
+   Exporte vecteurs (float32 mappés en mémoire) et propriétés dans rag/.cache/indexes
+   (LOCAL_INDEX_DIR) ; recherche hybride cosinus + BM25 dans le processus.
+   Relancer l'export après chaque ingestion.
+
+9️⃣  Benchmark de la recherche :
+   python 09_benchmark.py [nom_collection] --alpha 0.25,0.5,0.75 --limit 6,12 --index weaviate,local
+
+   recall@k, MRR et latences p50/p95/p99 par configuration, sur des questions non ingérées
+   (--offset 1000 --count 200) ou un fichier --pairs. Résultats JSON/CSV dans rag/.cache/benchmarks.
+
+🔟 Instantané et restauration d'une collection :
+   python 10_export_collection.py [nom_collection]              # → rag/.cache/snapshots/<collection>.parquet
+   python 11_import_collection.py fichier.parquet [--collection Copie] [--workers 8]
+
+   Objets et vecteurs (float32) dans un fichier Parquet : la restauration ne fait aucun appel
+   d'embedding. Collection créée si absente (--profile), signature d'embedding vérifiée sinon.
+
 🔧 ARCHITECTURE LANGCHAIN :
 
 ┌─────────────────┐    ┌──────────────────┐    ┌─────────────────┐
@@ -114,7 +222,7 @@ Chaque collection est indépendante et peut contenir des données différentes.
 
 - Langchain : Orchestration RAG complète
 - HuggingFace : Chargement du dataset
-- OpenAI : Embeddings + génération (GPT-4o-mini)
+- OpenAI ou LLM local compatible : Embeddings + génération (EMBEDDING_BACKEND, LLM_BACKEND)
 - Weaviate : Base de données vectorielle
 - Gradio : Interface utilisateur web
 - Docker : Containerisation
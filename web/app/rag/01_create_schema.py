@@ -1,10 +1,13 @@
 import weaviate
-from weaviate.classes.config import Property, DataType, Configure
+import argparse
 import requests
 import sys
 import time
 import os
 from dotenv import load_dotenv
+from answer_cache import mark_collection_updated
+from query_router import RouterVocabulary
+from schema_profiles import PROFILES, collection_config, describe, estimate_memory, load_profile
 
 load_dotenv()
 
@@ -14,32 +17,50 @@ HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
 GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
 DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
 
-# Nom de la collection (paramètre en argument ou variable d'environnement)
-collection_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COLLECTION
-
-# Affichage de l'aide si demandé
-if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help', 'help']:
-    print("""
-🗄️  Création de schéma Weaviate
-================================
-
-Utilisation : python 01_create_schema.py [nom_collection]
-
-Exemples :
-  python 01_create_schema.py                    # Utilise la variable WEAVIATE_DEFAULT_COLLECTION
-  python 01_create_schema.py CollectionName      # Crée la collection "CollectionName"
-  python 01_create_schema.py CollectionName2      # Crée la collection "CollectionName2"
-
-Options :
-  -h, --help, help    Affiche cette aide
+parser = argparse.ArgumentParser(
+    description="🗄️  Création de schéma Weaviate",
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    epilog="""Exemples :
+  python 01_create_schema.py                                # Utilise la variable WEAVIATE_DEFAULT_COLLECTION
+  python 01_create_schema.py CollectionName                 # Crée la collection "CollectionName"
+  python 01_create_schema.py CollectionName --profile low-memory
+  python 01_create_schema.py CollectionName --profile schema.yaml
 
 Ce script :
   • Crée une nouvelle collection Weaviate
   • Gère intelligemment les collections existantes
-  • Configure l'index vectoriel HNSW
-""")
+  • Configure l'index vectoriel HNSW, la compression et le BM25 selon le profil
+""",
+)
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection (défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--profile", default=os.getenv("SCHEMA_PROFILE", "default"),
+                    help=f"Profil de schéma : {', '.join(PROFILES)}, ou fichier YAML/JSON (env SCHEMA_PROFILE)")
+parser.add_argument("--list-profiles", action="store_true",
+                    help="Affiche les profils prédéfinis et quitte")
+parser.add_argument("--estimate-objects", type=int, default=1_000_000,
+                    help="Nombre d'objets pour l'estimation mémoire (défaut 1000000)")
+parser.add_argument("--dimensions", type=int, default=1536,
+                    help="Dimension des vecteurs pour l'estimation mémoire (défaut 1536)")
+args = parser.parse_args()
+
+if args.list_profiles:
+    for name, profile in PROFILES.items():
+        print(f"  {name:<12} {profile['description']}")
+        print(f"  {'':<12} {describe(profile)}")
     sys.exit(0)
 
+# Validation du profil avant toute connexion
+try:
+    profile = load_profile(args.profile)
+    schema = collection_config(profile)
+except (ValueError, TypeError) as e:
+    print(f"❌ Profil de schéma invalide : {e}")
+    sys.exit(1)
+
+# Nom de la collection (paramètre en argument ou variable d'environnement)
+collection_name = args.collection
+
 # Health check
 try:
     r = requests.get(f"http://{HOST}:{HTTP_PORT}/v1/.well-known/ready", timeout=5)
@@ -73,6 +94,8 @@ if client.collections.exists(collection_name):
         if choice == "1":
             print(f"🗑️ Suppression de la collection '{collection_name}'...")
             client.collections.delete(collection_name)
+            RouterVocabulary.remove(collection_name)
+            mark_collection_updated(collection_name)
             time.sleep(1)
             print(f"🛠️ Création de la nouvelle collection '{collection_name}'…")
             break
@@ -96,15 +119,12 @@ if client.collections.exists(collection_name):
 else:
     print(f"🛠️ Création de la nouvelle collection '{collection_name}'…")
 
-# Création de la collection
-client.collections.create(
-    name=collection_name,
-    properties=[
-        Property(name="command", data_type=DataType.TEXT),
-        Property(name="description", data_type=DataType.TEXT),
-    ],
-    vector_index_config=Configure.VectorIndex.hnsw()
-)
+# Création de la collection (propriétés, index HNSW, compression et BM25 selon le profil)
+print(f"⚙️  Profil '{profile['name']}' : {describe(profile)}")
+client.collections.create(name=collection_name, **schema)
 
 print(f"✅ La collection '{collection_name}' est créée avec succès ✅")
+memory = estimate_memory(profile, args.estimate_objects, args.dimensions)
+print(f"🧠 Mémoire estimée pour {args.estimate_objects} objets de dimension {args.dimensions} : "
+      f"vecteurs {memory['vectors'] / 2**20:.0f} Mo, graphe HNSW {memory['graph'] / 2**20:.0f} Mo")
 client.close()
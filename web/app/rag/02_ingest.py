@@ -1,10 +1,39 @@
 import os
 import sys
+import argparse
 import weaviate
-from weaviate.classes.data import DataObject
 from dotenv import load_dotenv
-from datasets import load_dataset
-from langchain_openai import OpenAIEmbeddings
+from batching import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_TOKENS_PER_REQUEST,
+    ThroughputMeter,
+    get_token_counter,
+    iter_batches,
+)
+from answer_cache import mark_collection_updated
+from checkpoint import IngestCheckpoint
+from chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_WORKERS, ChunkPool
+from embedding_backends import (
+    DEFAULT_EMBEDDING_BACKEND,
+    EMBEDDING_BACKENDS,
+    EmbeddingBackend,
+    check_signature,
+    collection_signature,
+    with_signature,
+)
+from embedding_cache import EmbeddingCache
+from embedding_workers import EmbeddingWorkerPool
+from ingest_pipeline import (
+    IngestDiff,
+    bounded_prefetch,
+    delete_objects,
+    fetch_existing_ids,
+    iter_records,
+    write_batches,
+)
+from query_router import RouterVocabulary
+from rate_limit import RateLimiter
+from sources import load_source_spec, parse_fields
 import warnings
 
 # Suppression des warnings non critiques
@@ -20,8 +49,107 @@ HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
 GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
 DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
 
+parser = argparse.ArgumentParser(
+    description="Ingestion d'un dataset HuggingFace ou d'un fichier JSONL/CSV/Parquet dans Weaviate",
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    epilog="""Exemples :
+  python 02_ingest.py CollectionName                        # hrsvrn/linux-commands-dataset (défaut)
+  python 02_ingest.py Wiki --spec wiki_source.yaml
+  python 02_ingest.py Wiki --source pages.jsonl --field command=title --field description=body \\
+      --template "{command}\\n{description}" --limit 0
+""",
+)
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection cible (défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--batch-size", type=int,
+                    default=int(os.getenv("INGEST_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                    help="Nombre de documents par requête d'embedding")
+parser.add_argument("--max-tokens", type=int,
+                    default=int(os.getenv("INGEST_MAX_TOKENS", DEFAULT_MAX_TOKENS_PER_REQUEST)),
+                    help="Budget de tokens par requête d'embedding")
+parser.add_argument("--workers", type=int,
+                    default=int(os.getenv("INGEST_WORKERS", "4")),
+                    help="Nombre de workers d'embedding concurrents")
+parser.add_argument("--rpm", type=int,
+                    default=int(os.getenv("EMBEDDING_RPM", "3000")),
+                    help="Quota de requêtes d'embedding par minute (0 = illimité)")
+parser.add_argument("--tpm", type=int,
+                    default=int(os.getenv("EMBEDDING_TPM", "1000000")),
+                    help="Quota de tokens d'embedding par minute (0 = illimité)")
+parser.add_argument("--spec", default=os.getenv("INGEST_SPEC"),
+                    help="Spécification de la source en YAML/JSON : source, split, config, format, fields, template "
+                         "(env INGEST_SPEC)")
+parser.add_argument("--source", default=os.getenv("INGEST_SOURCE"),
+                    help="Dataset HuggingFace ou fichier .jsonl/.csv/.parquet (défaut : hrsvrn/linux-commands-dataset)")
+parser.add_argument("--split", default=os.getenv("INGEST_SPLIT"),
+                    help="Split du dataset HuggingFace à ingérer (défaut train)")
+parser.add_argument("--field", action="append", metavar="PROPRIÉTÉ=COLONNE",
+                    help="Correspondance d'un champ, répétable (command et description obligatoires ; "
+                         "colonnes imbriquées : meta.title)")
+parser.add_argument("--template",
+                    help="Gabarit du texte vectorisé à partir des propriétés (défaut \"{description}\\n{command}\")")
+parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                    help="Découpe les descriptions en morceaux d'au plus N tokens, 0 = pas de découpage "
+                         "(env INGEST_CHUNK_TOKENS)")
+parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP,
+                    help="Tokens répétés d'un morceau au suivant, en phrases entières (défaut 50, env INGEST_CHUNK_OVERLAP)")
+parser.add_argument("--chunk-workers", type=int, default=DEFAULT_CHUNK_WORKERS,
+                    help="Processus de découpage (défaut : nombre de cœurs, env INGEST_CHUNK_WORKERS)")
+parser.add_argument("--limit", type=int,
+                    default=int(os.getenv("INGEST_LIMIT", "1000")),
+                    help="Nombre maximum de lignes à lire (0 = dataset complet)")
+parser.add_argument("--write-batch-size", type=int,
+                    default=int(os.getenv("INGEST_WRITE_BATCH_SIZE", "200")),
+                    help="Taille des lots d'écriture Weaviate")
+parser.add_argument("--queue-size", type=int,
+                    default=int(os.getenv("INGEST_QUEUE_SIZE", "1000")),
+                    help="Capacité de la file entre la lecture du dataset et la vectorisation")
+parser.add_argument("--embedding-backend", choices=EMBEDDING_BACKENDS, default=DEFAULT_EMBEDDING_BACKEND,
+                    help="Backend d'embedding : openai, local (CPU, sans réseau) ou hash (tests) "
+                         "(défaut : EMBEDDING_BACKEND)")
+parser.add_argument("--embedding-model", help="Modèle d'embedding (défaut : EMBEDDING_MODEL ou celui du backend)")
+parser.add_argument("--no-cache", action="store_true",
+                    help="Désactive le cache d'embeddings (EMBEDDING_CACHE_PATH)")
+parser.add_argument("--full", action="store_true",
+                    help="Réécrit tous les documents sans comparer au contenu de la collection")
+parser.add_argument("--keep-duplicates", action="store_true",
+                    help="Conserve les variantes d'une même commande (pas de dédoublonnage par clé canonique)")
+parser.add_argument("--delete-missing", action="store_true",
+                    help="Supprime les objets de la collection absents du dataset (nécessite --limit 0)")
+parser.add_argument("--resume", action="store_true",
+                    help="Reprend après la dernière ligne validée lors d'une ingestion interrompue")
+parser.add_argument("--checkpoint-every", type=int,
+                    default=int(os.getenv("INGEST_CHECKPOINT_EVERY", "10")),
+                    help="Enregistre un point de reprise tous les N lots vectorisés")
+args = parser.parse_args()
+
+if args.delete_missing and args.limit:
+    parser.error("--delete-missing compare la collection au dataset complet : utilisez --limit 0")
+if args.delete_missing and args.resume:
+    parser.error("--delete-missing doit lire tout le dataset : incompatible avec --resume")
+
+# Source et correspondance des champs, validées avant toute connexion
+try:
+    spec = load_source_spec(args.spec, args.source, args.split, parse_fields(args.field), args.template)
+except (ValueError, TypeError, OSError) as e:
+    print(f"❌ Source d'ingestion invalide : {e}")
+    sys.exit(1)
+
 # Nom de la collection (par défaut depuis env, peut être changé via argument)
-collection_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COLLECTION
+collection_name = args.collection
+
+# Backend d'embedding (openai, local ou hash) : son modèle fixe aussi le tokenizer du découpage
+backend = EmbeddingBackend.from_env(args.embedding_backend, args.embedding_model)
+
+# Découpage des documents longs sur plusieurs processus, créés avant la connexion gRPC et les threads
+chunker = None
+if args.chunk_tokens:
+    try:
+        chunker = ChunkPool(backend.model, args.chunk_tokens, args.chunk_overlap,
+                            spec.template, workers=args.chunk_workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
 
 # Connexion Weaviate v4
 client_db = weaviate.connect_to_custom(
@@ -31,43 +159,157 @@ client_db = weaviate.connect_to_custom(
 print("✅ Weaviate est connecté ✅")
 
 # Configuration Langchain pour les embeddings
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
+# chunk_size aligné sur la taille de lot : un lot = une requête à l'API
+# Les nouveaux essais sur 429 sont gérés par le pool de workers (backoff exponentiel)
+embeddings = backend.create(batch_size=args.batch_size, max_retries=0)
 
-print(f"📥 Chargement du dataset hrsvrn/linux-commands-dataset avec Langchain…")
+print(f"📥 Chargement de {spec.describe()}…")
 print(f"🎯 Collection cible : '{collection_name}'")
+print(f"📦 Lots de {args.batch_size} documents, {args.max_tokens} tokens maximum par requête")
+print(f"🧠 Embeddings : {backend.signature}")
+if chunker:
+    print(f"✂️  Morceaux de {args.chunk_tokens} tokens maximum, chevauchement {args.chunk_overlap}, "
+          f"{chunker.workers} processus de découpage")
+if backend.name == "openai":
+    print(f"⚙️  {args.workers} workers d'embedding, quotas : {args.rpm or '∞'} req/min, {args.tpm or '∞'} tokens/min")
+else:
+    # Pas de quota d'API pour un modèle local
+    print(f"⚙️  {args.workers} workers d'embedding, sans quota")
+
+print(f"📚 {args.limit or 'Toutes les'} lignes (lecture en streaming)")
+
+# Point de reprise : progression enregistrée après chaque lot validé par Weaviate
+checkpoint = IngestCheckpoint(collection_name, {
+    **spec.fingerprint(),
+    "limit": args.limit,
+    "dedupe": not args.keep_duplicates,
+    "chunks": [args.chunk_tokens, args.chunk_overlap] if chunker else None,
+})
+start_row = checkpoint.load() if args.resume else 0
+if start_row:
+    print(f"⏩ Reprise à la ligne {start_row} ({checkpoint.objects_written} objets déjà écrits)")
+
+# Lecture en streaming (datasets ou fichier local) : les lignes sont lues au fil de l'eau
+ds = spec.iter_rows(start=start_row, limit=args.limit)
 
-# Chargement du dataset avec datasets (plus fiable)
-ds = load_dataset("hrsvrn/linux-commands-dataset", split="train[:1000]")
-
-# Préparation des données pour insertion
-batch = []
-for item in ds:
-    description = (item.get("input") or "").strip()
-    command = (item.get("output") or "").strip()
-    
-    if description and command:
-        # Génération de l'embedding avec Langchain
-        embedding = embeddings.embed_query(f"{description}\n{command}")
-        
-        # Création de l'objet Weaviate v4
-        data_obj = DataObject(
-            properties={
-                "command": command,
-                "description": description,
-            },
-            vector=embedding,
-        )
-        batch.append(data_obj)
-
-print(f"📝 {len(batch)} documents préparés pour l'indexation")
-
-# Insertion directe avec Weaviate v4
 collection = client_db.collections.get(collection_name)
-collection.data.insert_many(batch)
 
-print(f"✅ {len(batch)} commandes Linux indexées dans '{collection_name}' avec Langchain ✅")
+# Une collection n'est alimentée que par le backend qui l'a vectorisée (requêtes et documents comparables)
+recorded_signature = collection_signature(collection)
+try:
+    check_signature(collection_name, recorded_signature, backend.signature)
+except ValueError as e:
+    print(f"❌ {e}")
+    client_db.close()
+    sys.exit(1)
+
+# Ingestion incrémentale : les UUID sont dérivés du contenu, seuls les nouveaux documents sont vectorisés ;
+# les variantes d'une commande (même clé canonique) sont dédoublonnées
+existing = {} if args.full else fetch_existing_ids(collection)
+diff = IngestDiff(existing, dedupe=not args.keep_duplicates, resume=bool(start_row))
+if not args.full:
+    print(f"🔎 {len(existing)} objets déjà présents dans '{collection_name}'")
+
+# Vocabulaire du routeur de questions (03/04), complété au fil de l'écriture : la requête ne parcourt pas la collection
+router_vocabulary = RouterVocabulary.load(collection_name)
+if router_vocabulary is None or not router_vocabulary.complete:
+    router_vocabulary = RouterVocabulary.from_collection(collection)
+
+# Pipeline en streaming : lecture (file bornée) → lots → vectorisation concurrente → écriture par lots
+count_tokens = get_token_counter(backend.model)
+meter = ThroughputMeter()
+cache = None if args.no_cache else EmbeddingCache.from_env()
+pool = EmbeddingWorkerPool(
+    embeddings.embed_documents,
+    workers=args.workers,
+    limiter=RateLimiter(args.rpm, args.tpm) if backend.name == "openai" else None,
+    cache=cache,
+    model=backend.signature,
+)
+# Avec découpage, chaque morceau est un objet (parent_id, chunk_index) comparé individuellement à la collection
+records = iter_records(ds, spec, start=start_row)
+if chunker:
+    records = chunker.map(records)
+records = bounded_prefetch(diff.select_new(records), maxsize=args.queue_size)
+batches = iter_batches(records, args.batch_size, args.max_tokens, count_tokens)
+
+failures = []
+
+
+def on_batch(records, tokens):
+    meter.add(len(records), tokens)
+    router_vocabulary.update(record["properties"] for record in records)
+
+
+def on_commit(last_record, written, new_failures, first_failed_row):
+    """Lot validé : on avance le point de reprise et on consigne les rejets"""
+    failures.extend(new_failures)
+    # Document découpé dont tous les morceaux ne sont pas encore écrits : il sera relu à la reprise
+    rows_committed = last_record["row"] + (1 if last_record.get("last_chunk", True) else 0)
+    # Objet rejeté : la reprise repart de sa ligne (les objets déjà présents sont ignorés par le diff)
+    if first_failed_row is not None:
+        rows_committed = min(rows_committed, first_failed_row)
+    checkpoint.commit(rows_committed, written, new_failures)
+
+
+indexed = write_batches(
+    collection,
+    pool.map(batches),
+    batch_size=args.write_batch_size,
+    on_batch=on_batch,
+    commit_every=args.checkpoint_every,
+    on_commit=on_commit,
+)
+failed = len(failures)
+
+print(meter.report())
+if chunker:
+    print(chunker.report())
+    chunker.close()
+print(f"📡 {pool.calls} appels à l'API d'embedding")
+if cache:
+    print(cache.report())
+    cache.close()
+if pool.retries or pool.throttled_seconds:
+    print(f"🚦 {pool.retries} nouveaux essais après 429, {pool.throttled_seconds:.1f}s d'attente du limiteur")
+
+if failed:
+    print(f"⚠️  {failed} objets rejetés par Weaviate, détail dans {checkpoint.failures_path}")
+    for error in failures[:5]:
+        print(f"   - {error.message}")
+    print("   Relancer l'ingestion (ou --resume, qui repart de la première ligne rejetée) réinsère uniquement les objets manquants")
+else:
+    # Avec des rejets, le point de reprise est conservé : il pointe sur la première ligne rejetée
+    checkpoint.clear()
+
+print(f"🧮 {diff.new} nouveaux, {diff.unchanged} inchangés, {diff.duplicates} doublons ignorés")
+
+deleted = 0
+# Documents modifiés : l'ancienne version (et ses morceaux) est supprimée une fois la nouvelle écrite
+stale = diff.stale_ids()
+if stale and failed:
+    print(f"⚠️  {len(stale)} objets remplacés conservés : des objets ont été rejetés, relancer l'ingestion")
+elif stale:
+    deleted = delete_objects(collection, stale)
+    print(f"♻️  {deleted} objets remplacés par une version modifiée supprimés")
+if args.delete_missing:
+    vanished = diff.vanished_ids()
+    if vanished:
+        removed = delete_objects(collection, vanished)
+        deleted += removed
+        print(f"🗑️  {removed} objets absents du dataset supprimés")
+
+# Signature du backend enregistrée dans la description de la collection (contrôlée par 03/04)
+if indexed and recorded_signature != backend.signature:
+    description = collection.config.get().description
+    collection.config.update(description=with_signature(description, backend.signature))
+    print(f"🏷️  Collection marquée : embedding {backend.signature}")
+
+# Les réponses mises en cache pour cette collection ne sont plus à jour
+router_vocabulary.save(collection_name)
+if indexed or deleted:
+    mark_collection_updated(collection_name)
+
+print(f"✅ {indexed - failed} documents indexés dans '{collection_name}' avec Langchain ✅")
 client_db.close()
 print("🔒 Fin de la connexion à Weaviate ✅")
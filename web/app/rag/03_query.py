@@ -1,119 +1,117 @@
-import os
-import sys
-import weaviate
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.prompts import PromptTemplate
-import warnings
-
-# Suppression des warnings non critiques
-warnings.filterwarnings("ignore", category=ResourceWarning)
-warnings.filterwarnings("ignore", message="Con004")
-os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
-
-load_dotenv()
-
-# Configuration Weaviate via variables d'environnement
-HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
-HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
-GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
-DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
-
-if len(sys.argv) < 2:
-    print("Utilisation : python 03_query.py \"poser une question ici\" [nom_collection]")
-    print("Exemple : python 03_query.py \"trouver les fichiers volumineux\" CollectionName")
-    sys.exit(1)
-
-question = sys.argv[1]
-collection_name = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_COLLECTION
-
-# Configuration Langchain
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
-
-# Connexion Weaviate v4
-client_db = weaviate.connect_to_custom(
-    http_host=HOST, http_port=HTTP_PORT, http_secure=False,
-    grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
-)
+import time
 
-collection = client_db.collections.get(collection_name)
+_process_start = time.perf_counter()
 
-# Configuration du LLM avec Langchain
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.0,
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
-
-# Template de prompt personnalisé
-prompt_template = """
-Tu es un assistant Linux expert.
-Réponds avec une commande dans un bloc code + explication ultra courte.
-
-Question: {question}
-
-Contexte:
-{context}
+import argparse
+import json
+import os
+import urllib.error
+import urllib.request
 
-Réponds en français, concis.
-"""
+# Client léger : aucun import Langchain/Weaviate tant que le service résident répond
+QUERY_SERVICE_URL = os.getenv("QUERY_SERVICE_URL", "http://127.0.0.1:8000")
+DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
+# Budget de démarrage du client (jusqu'à l'envoi de la question)
+STARTUP_BUDGET_MS = float(os.getenv("QUERY_STARTUP_BUDGET_MS", "200"))
 
-PROMPT = PromptTemplate(
-    template=prompt_template,
-    input_variables=["question", "context"]
+parser = argparse.ArgumentParser(
+    description="Pose une question au RAG Linux",
+    epilog='Exemple : python 03_query.py "trouver les fichiers volumineux" CollectionName',
 )
-
-# Génération de l'embedding pour la question
-question_embedding = embeddings.embed_query(question)
-
-# Recherche hybride avec Weaviate v4 (plus de résultats pour éviter les doublons)
-results = collection.query.hybrid(
-    query=question,
-    vector=question_embedding,
-    alpha=0.5,
-    limit=12
-).objects
-
-# Élimination des doublons et construction du contexte
-seen_commands = set()
-unique_results = []
-context = ""
-
-for obj in results:
-    cmd = obj.properties.get("command", "")
-    desc = obj.properties.get("description", "")
-    
-    # Éviter les doublons basés sur la commande
-    if cmd and cmd not in seen_commands:
-        seen_commands.add(cmd)
-        unique_results.append(obj)
-        context += f"- {cmd} :: {desc}\n"
-        
-        # Limiter à 4 résultats uniques maximum
-        if len(unique_results) >= 4:
-            break
-
-# Utiliser les résultats uniques pour l'affichage
-results = unique_results
-
-# Génération de la réponse avec Langchain
-prompt = PROMPT.format(question=question, context=context)
-response = llm.invoke(prompt)
-
-print(f"\n🔍 Question: {question}")
-print(f"🎯 Collection: {collection_name}")
+parser.add_argument("question", help="Question en langage naturel")
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection, ou plusieurs séparées par des virgules "
+                         "(défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--server", default=QUERY_SERVICE_URL,
+                    help="URL du service de requêtes 07_query_server.py")
+parser.add_argument("--local", action="store_true",
+                    help="Exécute la requête dans ce processus sans passer par le service")
+parser.add_argument("--index", choices=["weaviate", "local"], default=os.getenv("RAG_INDEX"),
+                    help="Index interrogé : Weaviate ou index local exporté (défaut : RAG_INDEX)")
+args = parser.parse_args()
+
+
+def ask_service(question: str, collection_name: str):
+    """Interroge le service résident, retourne None s'il est injoignable"""
+    request = urllib.request.Request(
+        f"{args.server.rstrip('/')}/query",
+        data=json.dumps({"question": question, "collection": collection_name,
+                         "index": args.index}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        # Réponse d'un proxy (nginx) ou 5xx inattendue : le corps n'est pas forcément du JSON
+        body = e.read().decode("utf-8", errors="replace")
+        try:
+            error = json.loads(body).get("error", str(e))
+        except (ValueError, AttributeError):
+            error = f"{e} : {body.strip()[:500]}" if body.strip() else str(e)
+        raise SystemExit(f"❌ {error}")
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def ask_local(question: str, collection_name: str):
+    """Mode autonome : construit les clients dans ce processus (démarrage lent)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    from query_service import DEFAULT_INDEX, QueryService
+
+    service = QueryService(args.index or DEFAULT_INDEX)
+    print(f"⏱️  Démarrage local : {service.startup['total']:.2f}s "
+          f"(lancer 07_query_server.py pour ne le payer qu'une fois)")
+    try:
+        return service.ask(question, collection_name)
+    finally:
+        service.close()
+
+
+startup_ms = (time.perf_counter() - _process_start) * 1000
+
+result = None if args.local else ask_service(args.question, args.collection)
+if result is None:
+    if not args.local:
+        print(f"⚠️  Service {args.server} injoignable, exécution locale")
+    result = ask_local(args.question, args.collection)
+
+print(f"\n🔍 Question: {result['question']}")
+print(f"🎯 Collection: {result['collection']} (index {result.get('index', 'weaviate')})")
 print("=" * 50)
 
 print("\n== Réponse Langchain ==")
-print(response.content)
+print(result["answer"])
 
 print("\n== Sources utilisées ==")
-for i, obj in enumerate(results, 1):
-    cmd = obj.properties.get("command", "")
-    desc = obj.properties.get("description", "")
-    print(f"{i}. {cmd} :: {desc}")
-
-client_db.close()
+for i, source in enumerate(result["sources"], 1):
+    origin = f" [{source['collection']}]" if source.get("collection") else ""
+    print(f"{i}. {source['command']} :: {source['description']}{origin}")
+
+if result.get("skipped_collections"):
+    print(f"\n⚠️  Collections ignorées (délai ou erreur) : {', '.join(result['skipped_collections'])}")
+
+if result.get("cached"):
+    print("\n⚡ Réponse servie depuis le cache de réponses")
+
+if result.get("route"):
+    saved = " (embedding évité)" if result["route"] == "keyword" else ""
+    print(f"\n🧭 Route : {result['route']}, {result['route_reason']}{saved}")
+
+timings = result.get("timings_ms")
+if timings:
+    print("\n⏱️  Durée par étape : " + " · ".join(
+        f"{stage} {timings[stage]:.0f} ms" for stage in ("embed", "search", "dedupe", "rerank", "generate")
+        if stage != "rerank" or result.get("reranker")
+    ))
+if result.get("reranker"):
+    print(f"🏅 Sources reclassées : {result['reranker']}")
+
+if result.get("prompt_tokens"):
+    print(f"🧮 Prompt : {result['prompt_tokens']} tokens (contexte {result['context_tokens']})")
+
+total_ms = (time.perf_counter() - _process_start) * 1000
+budget = "✅" if startup_ms <= STARTUP_BUDGET_MS else "⚠️  hors budget"
+print(f"\n⏱️  Démarrage client {startup_ms:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms {budget}), "
+      f"requête {result['seconds'] * 1000:.0f} ms, total {total_ms:.0f} ms")
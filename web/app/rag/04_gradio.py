@@ -1,9 +1,18 @@
 import os
+import traceback
 import gradio as gr
+import uvicorn
 import weaviate
+from fastapi import FastAPI, Response
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import PromptTemplate
+from embedding_backends import EmbeddingBackend
+from embedding_cache import with_cache
+from llm_backends import LLMBackend
+from metrics import PipelineMetrics, render
+from rerank import make_reranker
+from retrieval import DEFAULT_INDEX, AsyncWeaviateClient, RetrievalEngine
+from answer_cache import AnswerCache
 import warnings
 import asyncio
 import sys
@@ -23,8 +32,11 @@ os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+# Backends d'embedding et de génération (EMBEDDING_BACKEND, LLM_BACKEND) :
+# la clé OpenAI n'est requise que par le backend openai
+embedding_backend = EmbeddingBackend.from_env()
+llm_backend = LLMBackend.from_env()
+if "openai" in (embedding_backend.name, llm_backend.name) and not os.getenv("OPENAI_API_KEY"):
     raise RuntimeError("❌ La variable OPENAI_API_KEY est manquante")
 
 # Configuration Weaviate via variables d'environnement
@@ -33,31 +45,54 @@ HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
 GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
 DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
 
+# Concurrence Gradio : requêtes traitées simultanément et taille de la file d'attente
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "16"))
+GRADIO_QUEUE_SIZE = int(os.getenv("GRADIO_QUEUE_SIZE", "100"))
+
 # Nom de la collection (par défaut depuis env, peut être changé via argument)
 collection_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COLLECTION
 
-# Configuration Langchain
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=OPENAI_API_KEY
-)
+# Configuration Langchain (embeddings du backend EMBEDDING_BACKEND, derrière le cache partagé avec l'ingestion)
+embeddings = with_cache(embedding_backend.create(), embedding_backend.signature)
+
+# Connexion Weaviate v4 (client async, ouvert dans la boucle d'événements de Gradio),
+# ou index local exporté par 08_export_local_index.py avec RAG_INDEX=local
+if DEFAULT_INDEX == "local":
+    from local_index import LocalClient
+    async_client = LocalClient()
+else:
+    async_client = AsyncWeaviateClient(HOST, HTTP_PORT, GRPC_PORT)
 
-# Connexion Weaviate v4
-client_db = weaviate.connect_to_custom(
-    http_host=HOST, http_port=HTTP_PORT, http_secure=False,
-    grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
-)
 
-collection = client_db.collections.get(collection_name)
+def available_collections() -> list:
+    """Collections proposées dans l'interface (la collection par défaut en premier)"""
+    try:
+        if DEFAULT_INDEX == "local":
+            names = async_client.list_collections()
+        else:
+            client_db = weaviate.connect_to_custom(
+                http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+                grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+            )
+            try:
+                names = sorted(client_db.collections.list_all(simple=True))
+            finally:
+                client_db.close()
+    except Exception as e:
+        print(f"⚠️  Liste des collections indisponible : {e}")
+        names = []
+    return [collection_name] + [name for name in names if name != collection_name]
 
-print(f"🎯 Collection utilisée : '{collection_name}'")
 
-# Configuration du LLM avec Langchain
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.0,
-    openai_api_key=OPENAI_API_KEY
-)
+collection_choices = available_collections()
+print(f"🧠 Embeddings : {embedding_backend.signature}")
+print(f"🎯 Collection utilisée : '{collection_name}' (index {DEFAULT_INDEX}), "
+      f"{len(collection_choices)} collection(s) disponible(s)")
+
+# Configuration du LLM (backend LLM_BACKEND) ; sous rafale, les prompts identiques
+# en cours de génération partagent un seul appel et un seul flux de tokens
+llm = llm_backend.create(temperature=0.0)
+print(f"💬 LLM : {llm_backend.description}")
 
 # Template de prompt pour l'interface
 prompt_template = """
@@ -79,58 +114,74 @@ PROMPT = PromptTemplate(
     input_variables=["question", "context"]
 )
 
-def ask_linux_langchain(question: str):
-    """Fonction principale utilisant Langchain pour répondre aux questions Linux"""
+# Chemin de requête asynchrone : embedding, recherche et génération sans bloquer les autres utilisateurs
+# Cache de réponses : les questions répétées ou quasi identiques sont servies en quelques millisecondes
+answer_cache = AnswerCache.from_env()
+# Métriques Prometheus (/metrics sur le port de Gradio) et traces par étape (RAG_TRACING)
+metrics = PipelineMetrics()
+metrics.watch(embeddings, llm, answer_cache)
+# Reclassement des candidats (RAG_RERANK=cross-encoder ou lexical) dans le budget RAG_RERANK_BUDGET_MS
+reranker = make_reranker()
+if reranker is not None:
+    print(f"🏅 Reclassement : {reranker.name} (budget {reranker.budget * 1000:.0f} ms)")
+engine = RetrievalEngine(embeddings, llm, PROMPT, async_client=async_client, answer_cache=answer_cache,
+                         embedding_signature=embedding_backend.signature, metrics=metrics, reranker=reranker)
+
+def format_sources(sources: list) -> str:
+    """Formatage des sources pour l'affichage"""
+    sources_text = "📚 Sources utilisées par Langchain:\n\n"
+    for i, source in enumerate(sources, 1):
+        origin = f" ({source['collection']})" if source.get("collection") else ""
+        sources_text += f"{i}. **{source['command']}**{origin}\n   ↳ {source['description']}\n\n"
+    return sources_text.strip()
+
+def log_router_stats(every: int = 20):
+    """Part des questions par route et latence d'embedding évitée, toutes les `every` questions"""
+    stats = engine.router_stats.as_dict()
+    if engine.routing and sum(stats["routes"].values()) % every == 0:
+        shares = ", ".join(f"{name} {share:.0%}" for name, share in stats["shares"].items())
+        print(f"🧭 Routes : {shares} · {stats['embedding_calls_saved']} embeddings évités "
+              f"(≈ {stats['latency_saved_ms']:.0f} ms)")
+
+async def ask_linux_langchain(question: str, collections: list = None):
+    """Fonction principale utilisant Langchain pour répondre aux questions Linux
+
+    Générateur : les sources s'affichent dès la fin de la recherche,
+    puis la réponse est diffusée token par token. Avec plusieurs collections,
+    les recherches sont parallèles et leurs résultats fusionnés (RRF).
+    """
     if not question:
-        return "", ""
+        yield "", ""
+        return
 
+    answer = ""
+    sources_text = ""
     try:
-        # Génération de l'embedding pour la question
-        question_embedding = embeddings.embed_query(question)
-        
-        # Recherche hybride avec Weaviate v4 (plus de résultats pour éviter les doublons)
-        results = collection.query.hybrid(
-            query=question,
-            vector=question_embedding,
-            alpha=0.5,
-            limit=12  # Plus de résultats pour avoir de la diversité
-        ).objects
-        
-        # Élimination des doublons et construction du contexte
-        seen_commands = set()
-        unique_results = []
-        context = ""
-        
-        for obj in results:
-            cmd = obj.properties.get("command", "")
-            desc = obj.properties.get("description", "")
-            
-            # Éviter les doublons basés sur la commande
-            if cmd and cmd not in seen_commands:
-                seen_commands.add(cmd)
-                unique_results.append(obj)
-                context += f"- {cmd} :: {desc}\n"
-                
-                # Limiter à 4 résultats uniques maximum
-                if len(unique_results) >= 4:
-                    break
-        
-        # Génération de la réponse avec Langchain
-        prompt = PROMPT.format(question=question, context=context)
-        response = llm.invoke(prompt)
-        
-        # Formatage des sources pour l'affichage
-        sources_text = "📚 Sources utilisées par Langchain:\n\n"
-        for i, obj in enumerate(unique_results, 1):
-            cmd = obj.properties.get("command", "")
-            desc = obj.properties.get("description", "")
-            sources_text += f"{i}. **{cmd}**\n   ↳ {desc}\n\n"
-        
-        return response.content.strip(), sources_text.strip()
+        async for kind, value in engine.astream(question, collections or [collection_name]):
+            if kind == "sources":
+                sources_text = format_sources(value)
+                yield "⏳ Génération de la réponse…", sources_text
+            elif kind == "token":
+                answer += value
+                yield answer, sources_text
+            elif kind == "done":
+                cached = " (cache)" if value.cached else ""
+                route = f"route {value.route.name} · " if value.route else ""
+                tokens = f" · prompt {value.prompt_tokens} tokens" if value.prompt_tokens else ""
+                reranked = f" · reclassement {value.reranker}" if value.reranker else ""
+                print(f"⏱️  {route}{value.timings.summary()}{tokens}{reranked}{cached}")
+                if value.skipped:
+                    print(f"⚠️  Collections ignorées (délai ou erreur) : {', '.join(value.skipped)}")
+                log_router_stats()
+
+        yield answer.strip(), sources_text
         
     except Exception as e:
+        # Erreur comptée dans /metrics et journalisée avec sa pile d'appels
+        metrics.error("gradio", e)
+        traceback.print_exc()
         error_msg = f"❌ Erreur Langchain: {str(e)}"
-        return error_msg, ""
+        yield error_msg, sources_text
 
 # Interface Gradio avec Langchain
 with gr.Blocks(
@@ -143,11 +194,11 @@ with gr.Blocks(
     
     Posez votre question en français et recevez la commande Linux appropriée !
     
-    **Collection active :** `{collection_name}`
+    **Collection active :** `{collection_name}` (index `{DEFAULT_INDEX}`)
     
     **Technologies utilisées :**
     - 🔗 Langchain pour l'orchestration RAG
-    - 🧠 OpenAI GPT-4o-mini pour la génération
+    - 🧠 `{llm_backend.description}` pour la génération (LLM_BACKEND)
     - 🔍 Weaviate pour la recherche vectorielle
     - 📊 HuggingFace pour le dataset
     """)
@@ -160,6 +211,13 @@ with gr.Blocks(
                 lines=2
             )
             
+            collections_input = gr.Dropdown(
+                choices=collection_choices,
+                value=[collection_name],
+                multiselect=True,
+                label="Collections interrogées",
+            )
+
             search_btn = gr.Button("🔍 Rechercher", variant="primary")
             
         with gr.Column(scale=1):
@@ -188,14 +246,14 @@ with gr.Blocks(
     # Gestion des événements
     search_btn.click(
         fn=ask_linux_langchain,
-        inputs=[question_input],
+        inputs=[question_input, collections_input],
         outputs=[answer_output, sources_output]
     )
     
     # Recherche aussi avec Enter
     question_input.submit(
         fn=ask_linux_langchain,
-        inputs=[question_input],
+        inputs=[question_input, collections_input],
         outputs=[answer_output, sources_output]
     )
 
@@ -210,9 +268,20 @@ with gr.Blocks(
     - `ChatOpenAI` → Génération des réponses
     """)
 
+# File d'attente : au plus GRADIO_CONCURRENCY requêtes en parallèle, GRADIO_QUEUE_SIZE en attente
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE_SIZE)
+
+# Application FastAPI : /metrics (Prometheus) à côté de l'interface Gradio, sur le même port
+app = FastAPI()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+
+app = gr.mount_gradio_app(app, demo, path="/", root_path="/rag")
+
 # Lancement de l'interface
-demo.launch(
-    server_name="0.0.0.0",
-    server_port=7860,
-    root_path="/rag"
-)
+uvicorn.run(app, host="0.0.0.0", port=7860)
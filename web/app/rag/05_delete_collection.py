@@ -8,6 +8,8 @@ import os
 import sys
 import weaviate
 from dotenv import load_dotenv
+from answer_cache import mark_collection_updated
+from query_router import RouterVocabulary
 import warnings
 
 # Suppression des warnings non critiques
@@ -83,6 +85,8 @@ def delete_collection(collection_name: str):
     try:
         print(f"🗑️  Suppression de la collection '{collection_name}'...")
         client_db.collections.delete(collection_name)
+        RouterVocabulary.remove(collection_name)
+        mark_collection_updated(collection_name)
         print(f"✅ Collection '{collection_name}' supprimée avec succès !")
         
         # Vérification de la suppression
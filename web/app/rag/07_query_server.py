@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Service de requêtes RAG résident (API HTTP/JSON)
+Garde les clients OpenAI et Weaviate en mémoire : 03_query.py l'interroge sans payer
+le coût d'import et de connexion à chaque question
+"""
+
+import json
+import os
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from metrics import render
+
+load_dotenv()
+
+SERVICE_HOST = os.getenv("QUERY_SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("QUERY_SERVICE_PORT", "8000"))
+
+
+def make_handler(service, default_collection: str):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", **service.stats()})
+            elif self.path == "/metrics":
+                body, content_type = render()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json(404, {"error": "Ressource inconnue"})
+
+        def do_POST(self):
+            if self.path != "/query":
+                self._send_json(404, {"error": "Ressource inconnue"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError):
+                self._send_json(400, {"error": "Corps JSON invalide"})
+                return
+
+            question = (payload.get("question") or "").strip()
+            if not question:
+                self._send_json(400, {"error": "Le champ 'question' est requis"})
+                return
+
+            try:
+                result = service.ask(question, payload.get("collection") or default_collection,
+                                     payload.get("index"))
+            except (ValueError, FileNotFoundError) as e:
+                service.metrics.error("query_server", e)
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                service.metrics.error("query_server", e)
+                traceback.print_exc()
+                self._send_json(500, {"error": f"Erreur Langchain: {e}"})
+                return
+            self._send_json(200, result)
+
+    return QueryHandler
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help', 'help']:
+        print("""
+🛰️  Service de requêtes RAG
+===========================
+
+Utilisation : python 07_query_server.py [nom_collection]
+
+Variables d'environnement :
+  QUERY_SERVICE_HOST   Interface d'écoute (défaut 0.0.0.0)
+  QUERY_SERVICE_PORT   Port d'écoute (défaut 8000)
+  RAG_INDEX            Index par défaut : weaviate ou local (08_export_local_index.py)
+  RAG_COLLECTION_TIMEOUT  Délai par collection des requêtes multi-collections (défaut 2 s)
+  RAG_TRACING          Traces par étape : off (défaut), log (JSON) ou otel (OpenTelemetry)
+  RAG_RERANK           Reclassement : off (défaut), lexical ou cross-encoder (budget RAG_RERANK_BUDGET_MS)
+
+Endpoints :
+  POST /query    {"question": "...", "collection": "...", "index": "local"}
+                 "collection" accepte "A,B" ou ["A", "B"] (recherche parallèle, fusion RRF)
+  GET  /health   État du service, temps de démarrage et cache de réponses
+  GET  /metrics  Métriques Prometheus (durées par étape, tokens, caches, erreurs)
+
+Client : python 03_query.py "question" [nom_collection]
+""")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    from query_service import DEFAULT_COLLECTION, QueryService
+
+    default_collection = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COLLECTION
+    service = QueryService()
+    ready = time.perf_counter() - start
+
+    print("⏱️  Démarrage du service :")
+    for stage, seconds in service.startup.items():
+        print(f"   - {stage} : {seconds * 1000:.0f} ms")
+    print(f"✅ Service prêt en {ready:.2f}s, payé une seule fois au lieu d'à chaque question")
+    print(f"🎯 Collection par défaut : '{default_collection}', index {service.index}")
+    print(f"🛰️  Écoute sur http://{SERVICE_HOST}:{SERVICE_PORT}/query")
+
+    server = ThreadingHTTPServer((SERVICE_HOST, SERVICE_PORT), make_handler(service, default_collection))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print("🔒 Service arrêté, connexion Weaviate fermée.")
+
+
+if __name__ == "__main__":
+    main()
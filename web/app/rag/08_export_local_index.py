@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Export d'une collection Weaviate vers un index local
+Vecteurs float32 (mappés en mémoire) et propriétés, interrogeables sans Weaviate
+avec RAG_INDEX=local (03_query.py, 04_gradio.py)
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+import weaviate
+from dotenv import load_dotenv
+from answer_cache import mark_collection_updated
+from embedding_backends import collection_signature
+from local_index import DEFAULT_INDEX_DIR, LocalIndex, export_collection
+
+# Suppression des warnings non critiques
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", message="Con004")
+os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
+
+load_dotenv()
+
+# Configuration Weaviate via variables d'environnement
+HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
+HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
+GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
+
+parser = argparse.ArgumentParser(
+    description="Exporte une collection Weaviate vers un index vectoriel local",
+    epilog="Exemple : python 08_export_local_index.py CollectionName",
+)
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection (défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--output", default=DEFAULT_INDEX_DIR,
+                    help="Répertoire des index locaux (défaut : LOCAL_INDEX_DIR ou rag/.cache/indexes)")
+args = parser.parse_args()
+
+try:
+    client_db = weaviate.connect_to_custom(
+        http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+        grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+    )
+    print(f"✅ Connexion à Weaviate réussie ({HOST}:{HTTP_PORT})")
+except Exception as e:
+    print(f"❌ Erreur de connexion à Weaviate : {e}")
+    sys.exit(1)
+
+try:
+    if not client_db.collections.exists(args.collection):
+        print(f"❌ La collection '{args.collection}' n'existe pas.")
+        sys.exit(1)
+
+    print(f"📤 Export de '{args.collection}' vers {args.output}…")
+    start = time.perf_counter()
+    collection = client_db.collections.get(args.collection)
+    meta = export_collection(collection, args.collection, args.output, embedding=collection_signature(collection))
+    print(f"✅ {meta['count']} objets exportés (dimension {meta['dimension']}, "
+          f"embedding {meta['embedding'] or 'non renseigné'}) en {time.perf_counter() - start:.2f}s")
+finally:
+    client_db.close()
+
+# Les réponses en cache ont pu être générées à partir d'un index plus ancien
+mark_collection_updated(args.collection)
+
+# Vérification : chargement et recherche de référence sur le premier vecteur
+if meta["count"]:
+    start = time.perf_counter()
+    index = LocalIndex(args.collection, args.output)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    index.hybrid(query="liste fichiers", vector=index.vectors[0], alpha=0.5, limit=4)
+    print(f"⚡ Index chargé en {loaded * 1000:.1f} ms, recherche hybride en "
+          f"{(time.perf_counter() - start) * 1000:.2f} ms")
+print("💡 Utilisation : RAG_INDEX=local python 03_query.py \"question\" " + args.collection)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche : recall@k, MRR et latences p50/p95/p99 par configuration
+(index, alpha, limit), sur des paires (question, commande attendue) tirées de lignes
+non ingérées du dataset. Résultats en JSON et CSV pour suivre les régressions.
+"""
+
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+import warnings
+import weaviate
+from dotenv import load_dotenv
+from datasets import load_dataset
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, EMBEDDING_BACKENDS, EmbeddingBackend
+from embedding_cache import with_cache
+from evaluation import (
+    DEFAULT_RESULTS_DIR,
+    collection_keys,
+    evaluate,
+    load_pairs_file,
+    pairs_from_rows,
+    write_results,
+)
+from retrieval import INDEXES
+
+# Suppression des warnings non critiques
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", message="Con004")
+os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
+
+load_dotenv()
+
+# Configuration Weaviate via variables d'environnement
+HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
+HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
+GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
+
+
+def csv_list(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item.strip()]
+
+
+parser = argparse.ArgumentParser(
+    description="Benchmark de la recherche (recall@k, MRR, latences) sur une collection",
+    epilog="Exemple : python 09_benchmark.py CollectionName --alpha 0.25,0.5,0.75 --limit 6,12",
+)
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection (défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--index", type=csv_list(str), default=["weaviate"],
+                    help="Index comparés : weaviate, local ou weaviate,local")
+parser.add_argument("--alpha", type=csv_list(float), default=[0.25, 0.5, 0.75],
+                    help="Valeurs d'alpha testées (défaut 0.25,0.5,0.75)")
+parser.add_argument("--limit", type=csv_list(int), default=[6, 12],
+                    help="Nombre de résultats demandés (défaut 6,12)")
+parser.add_argument("--k", type=csv_list(int), default=[1, 3, 5],
+                    help="Rangs pour recall@k (défaut 1,3,5)")
+parser.add_argument("--split", default="train", help="Split du dataset")
+parser.add_argument("--offset", type=int, default=1000,
+                    help="Première ligne non ingérée (défaut 1000 = --limit de 02_ingest.py ; 0 = lignes ingérées)")
+parser.add_argument("--count", type=int, default=200, help="Nombre de paires d'évaluation")
+parser.add_argument("--pairs", help="Fichier JSONL de paires {\"question\", \"command\"} à la place du dataset")
+parser.add_argument("--embedding-backend", choices=EMBEDDING_BACKENDS, default=DEFAULT_EMBEDDING_BACKEND,
+                    help="Backend d'embedding des questions, celui de l'ingestion (défaut : EMBEDDING_BACKEND)")
+parser.add_argument("--embedding-model", help="Modèle d'embedding (défaut : EMBEDDING_MODEL ou celui du backend)")
+parser.add_argument("--warmup", type=int, default=3, help="Requêtes de chauffe par configuration")
+parser.add_argument("--output-dir", default=DEFAULT_RESULTS_DIR, help="Répertoire des résultats")
+parser.add_argument("--name", help="Nom des fichiers de résultats (défaut : benchmark-<date>)")
+args = parser.parse_args()
+
+unknown = set(args.index) - set(INDEXES)
+if unknown:
+    parser.error(f"index inconnu : {', '.join(sorted(unknown))}")
+
+client_db = None
+collections = {}
+if "weaviate" in args.index:
+    client_db = weaviate.connect_to_custom(
+        http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+        grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+    )
+    if not client_db.collections.exists(args.collection):
+        print(f"❌ La collection '{args.collection}' n'existe pas.")
+        client_db.close()
+        sys.exit(1)
+    collections["weaviate"] = client_db.collections.get(args.collection)
+if "local" in args.index:
+    from local_index import LocalIndex
+    collections["local"] = LocalIndex(args.collection)
+
+try:
+    # Paires d'évaluation : reformulations de commandes présentes dans la collection
+    if args.pairs:
+        pairs = load_pairs_file(args.pairs)
+    else:
+        known_keys = collection_keys(collections[args.index[0]])
+        ds = load_dataset("hrsvrn/linux-commands-dataset", split=args.split, streaming=True).skip(args.offset)
+        pairs = pairs_from_rows(ds, known_keys, args.count)
+    if not pairs:
+        print("❌ Aucune paire d'évaluation : essayez --offset 0 (lignes ingérées) ou --pairs fichier.jsonl")
+        sys.exit(1)
+    print(f"🧪 {len(pairs)} paires d'évaluation sur '{args.collection}'")
+
+    # Embeddings des questions calculés une fois (et mis en cache) : seule la recherche est chronométrée
+    backend = EmbeddingBackend.from_env(args.embedding_backend, args.embedding_model)
+    embeddings = with_cache(backend.create(), backend.signature)
+    vectors = embeddings.embed_documents([pair["question"] for pair in pairs])
+
+    metadata = {
+        "collection": args.collection,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embedding": backend.signature,
+        "pairs": len(pairs),
+        "source": args.pairs or f"{args.split}[{args.offset}:]",
+    }
+    try:
+        metadata["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    if "weaviate" in collections:
+        # Réglages HNSW / compression de la collection, pour interpréter les écarts entre versions
+        metadata["vector_index_config"] = str(collections["weaviate"].config.get().vector_index_config)
+
+    results = []
+    header = f"{'index':<9} {'alpha':>5} {'limit':>5} " + " ".join(f"{'R@' + str(k):>6}" for k in args.k) \
+        + f" {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"
+    print(header)
+    print("-" * len(header))
+    for index, alpha, limit in itertools.product(args.index, args.alpha, args.limit):
+        collection = collections[index]
+
+        def search(question, vector):
+            return collection.query.hybrid(query=question, vector=vector, alpha=alpha, limit=limit).objects
+
+        metrics = evaluate(search, pairs, vectors, [k for k in args.k if k <= limit], args.warmup)
+        results.append({"index": index, "alpha": alpha, "limit": limit, **metrics})
+        print(f"{index:<9} {alpha:>5} {limit:>5} "
+              + " ".join(f"{metrics[f'recall@{k}']:>6.3f}" if f"recall@{k}" in metrics else f"{'-':>6}"
+                         for k in args.k)
+              + f" {metrics['mrr']:>6.3f} {metrics['p50_ms']:>7.2f} {metrics['p95_ms']:>7.2f} {metrics['p99_ms']:>7.2f}")
+
+    paths = write_results(results, metadata, args.output_dir, args.name)
+    print(f"\n💾 Résultats : {paths['json']}\n              {paths['csv']}")
+finally:
+    if client_db is not None:
+        client_db.close()
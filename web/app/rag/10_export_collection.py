@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Instantané d'une collection Weaviate au format Parquet
+Propriétés et vecteurs lus par le curseur Weaviate, sans aucun appel d'embedding,
+pour restaurer la collection ailleurs avec 11_import_collection.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+import weaviate
+from dotenv import load_dotenv
+from embedding_backends import collection_signature
+from snapshot import DEFAULT_SNAPSHOT_DIR, export_snapshot, snapshot_path
+
+# Suppression des warnings non critiques
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", message="Con004")
+os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
+
+load_dotenv()
+
+# Configuration Weaviate via variables d'environnement
+HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
+HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
+GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
+
+parser = argparse.ArgumentParser(
+    description="Exporte une collection Weaviate (propriétés et vecteurs) dans un fichier Parquet",
+    epilog="Exemple : python 10_export_collection.py CollectionName --output /tmp/linux.parquet",
+)
+parser.add_argument("collection", nargs="?", default=DEFAULT_COLLECTION,
+                    help="Nom de la collection (défaut : WEAVIATE_DEFAULT_COLLECTION)")
+parser.add_argument("--output", default=None,
+                    help="Fichier Parquet (défaut : SNAPSHOT_DIR/<collection>.parquet, rag/.cache/snapshots)")
+parser.add_argument("--batch-rows", type=int, default=5000,
+                    help="Objets par groupe de lignes Parquet (mémoire bornée, défaut 5000)")
+args = parser.parse_args()
+
+output = args.output or snapshot_path(args.collection, DEFAULT_SNAPSHOT_DIR)
+
+try:
+    client_db = weaviate.connect_to_custom(
+        http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+        grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+    )
+    print(f"✅ Connexion à Weaviate réussie ({HOST}:{HTTP_PORT})")
+except Exception as e:
+    print(f"❌ Erreur de connexion à Weaviate : {e}")
+    sys.exit(1)
+
+try:
+    if not client_db.collections.exists(args.collection):
+        print(f"❌ La collection '{args.collection}' n'existe pas.")
+        sys.exit(1)
+
+    print(f"📤 Export de '{args.collection}' vers {output}…")
+    start = time.perf_counter()
+    collection = client_db.collections.get(args.collection)
+    description = collection.config.get().description
+    try:
+        meta = export_snapshot(collection, output, batch_rows=args.batch_rows, metadata={
+            "collection": args.collection,
+            "description": description,
+            "embedding": collection_signature(collection),
+        })
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output)
+    print(f"✅ {meta['count']} objets exportés (dimension {meta['dimension']}, "
+          f"embedding {meta['embedding'] or 'non renseigné'}) en {elapsed:.2f}s "
+          f"· {size / 2**20:.1f} Mo ({meta['count'] / max(elapsed, 1e-9):.0f} objets/s)")
+finally:
+    client_db.close()
+
+print(f"💡 Restauration : python 11_import_collection.py {output}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Restauration d'une collection Weaviate depuis un instantané Parquet (10_export_collection.py)
+Vecteurs réutilisés tels quels : aucun appel d'embedding, écritures par lots en parallèle
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+import weaviate
+from dotenv import load_dotenv
+from answer_cache import mark_collection_updated
+from embedding_backends import check_signature, collection_signature, with_signature
+from query_router import RouterVocabulary
+from schema_profiles import PROFILES, collection_config, describe, load_profile
+from snapshot import import_snapshot, read_metadata
+
+# Suppression des warnings non critiques
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", message="Con004")
+os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
+
+load_dotenv()
+
+# Configuration Weaviate via variables d'environnement
+HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
+HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
+GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+
+parser = argparse.ArgumentParser(
+    description="Recharge un instantané Parquet dans une collection Weaviate, sans recalculer les embeddings",
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    epilog="""Exemples :
+  python 11_import_collection.py .cache/snapshots/NewCollection.parquet
+  python 11_import_collection.py linux.parquet --collection LinuxCopy --profile low-memory
+
+La collection est créée (profil de schéma) si elle n'existe pas ; sinon la signature
+d'embedding de l'instantané doit correspondre à la sienne. Les UUID d'origine sont
+conservés : réimporter le même instantané met à jour les objets sans doublons.
+""",
+)
+parser.add_argument("snapshot", help="Fichier Parquet produit par 10_export_collection.py")
+parser.add_argument("--collection", default=None,
+                    help="Collection cible (défaut : collection d'origine de l'instantané)")
+parser.add_argument("--profile", default=os.getenv("SCHEMA_PROFILE", "default"),
+                    help=f"Profil de schéma si la collection est créée : {', '.join(PROFILES)}, "
+                         "ou fichier YAML/JSON (env SCHEMA_PROFILE)")
+parser.add_argument("--batch-size", type=int, default=int(os.getenv("IMPORT_BATCH_SIZE", "500")),
+                    help="Objets par requête d'écriture (env IMPORT_BATCH_SIZE, défaut 500)")
+parser.add_argument("--workers", type=int, default=int(os.getenv("IMPORT_WORKERS", "4")),
+                    help="Requêtes d'écriture en parallèle (env IMPORT_WORKERS, défaut 4)")
+args = parser.parse_args()
+
+if not os.path.exists(args.snapshot):
+    print(f"❌ Instantané introuvable : {args.snapshot}")
+    sys.exit(1)
+
+meta = read_metadata(args.snapshot)
+collection_name = args.collection or meta.get("collection")
+if not collection_name:
+    print("❌ Collection d'origine absente de l'instantané : précisez --collection")
+    sys.exit(1)
+print(f"📦 Instantané : {meta['count']} objets, dimension {meta.get('dimension')}, "
+      f"embedding {meta.get('embedding') or 'non renseigné'}")
+
+try:
+    client_db = weaviate.connect_to_custom(
+        http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+        grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+    )
+    print(f"✅ Connexion à Weaviate réussie ({HOST}:{HTTP_PORT})")
+except Exception as e:
+    print(f"❌ Erreur de connexion à Weaviate : {e}")
+    sys.exit(1)
+
+try:
+    if client_db.collections.exists(collection_name):
+        # Des vecteurs d'un autre modèle rendraient la recherche incohérente
+        collection = client_db.collections.get(collection_name)
+        try:
+            check_signature(collection_name, collection_signature(collection), meta.get("embedding"))
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"🎯 Collection existante '{collection_name}' : objets ajoutés ou mis à jour")
+        router_vocabulary = RouterVocabulary.load(collection_name)
+        if router_vocabulary is None or not router_vocabulary.complete:
+            router_vocabulary = RouterVocabulary.from_collection(collection)
+    else:
+        try:
+            profile = load_profile(args.profile)
+            schema = collection_config(profile)
+        except (ValueError, TypeError) as e:
+            print(f"❌ Profil de schéma invalide : {e}")
+            sys.exit(1)
+        print(f"🛠️ Création de la collection '{collection_name}' (profil '{profile['name']}' : {describe(profile)})")
+        description = meta.get("description") or ""
+        if meta.get("embedding"):
+            description = with_signature(description, meta["embedding"])
+        client_db.collections.create(name=collection_name, description=description or None, **schema)
+        collection = client_db.collections.get(collection_name)
+        router_vocabulary = RouterVocabulary()
+
+    def on_batch(written: int, rows: list):
+        router_vocabulary.update(rows)
+        print(f"   … {written}/{meta['count']} objets", flush=True)
+
+    print(f"📥 Import par lots de {args.batch_size} objets, {args.workers} requêtes en parallèle…")
+    start = time.perf_counter()
+    written, failed = import_snapshot(
+        collection, args.snapshot, batch_size=args.batch_size, concurrent_requests=args.workers,
+        on_batch=on_batch,
+    )
+    elapsed = time.perf_counter() - start
+finally:
+    client_db.close()
+
+# Vocabulaire du routeur de questions, puis invalidation des réponses générées avant la restauration
+router_vocabulary.save(collection_name)
+mark_collection_updated(collection_name)
+
+print(f"✅ {written - len(failed)} objets importés dans '{collection_name}' en {elapsed:.2f}s "
+      f"({written / max(elapsed, 1e-9):.0f} objets/s), 0 appel d'embedding")
+if failed:
+    print(f"⚠️  {len(failed)} objets rejetés, par exemple : {failed[0].message}")
+    sys.exit(1)
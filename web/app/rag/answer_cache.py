@@ -0,0 +1,169 @@
+"""
+Cache sémantique des réponses
+Recherche exacte sur la question normalisée, puis par similarité cosinus avec les questions déjà posées,
+avec TTL, éviction LRU et invalidation quand la collection est ré-ingérée
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_STAMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "collections")
+
+
+def normalize_question(question: str) -> str:
+    """Casse, espaces et ponctuation finale ignorés"""
+    text = unicodedata.normalize("NFC", question).casefold()
+    return " ".join(text.split()).rstrip(" ?!.")
+
+
+def _stamp_path(collection_name: str, directory: str = DEFAULT_STAMP_DIR) -> str:
+    return os.path.join(directory, collection_name)
+
+
+def mark_collection_updated(collection_name: str, directory: str = DEFAULT_STAMP_DIR):
+    """Signale une modification de la collection (ingestion, suppression) aux caches de réponses"""
+    os.makedirs(directory, exist_ok=True)
+    with open(_stamp_path(collection_name, directory), "w", encoding="utf-8") as f:
+        f.write(time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+
+def collection_updated_at(collection_name: str, directory: str = DEFAULT_STAMP_DIR) -> float:
+    """Date de dernière modification ; pour des collections fédérées ("A+B"), la plus récente"""
+    updated = 0.0
+    for name in collection_name.split("+"):
+        try:
+            updated = max(updated, os.stat(_stamp_path(name, directory)).st_mtime)
+        except FileNotFoundError:
+            pass
+    return updated
+
+
+class AnswerCache:
+    """Réponses mises en cache par collection, thread-safe"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, similarity: float = 0.95,
+                 stamp_dir: str = DEFAULT_STAMP_DIR):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.stamp_dir = stamp_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Matrice des embeddings de questions par collection, reconstruite après modification
+        self._matrices = {}
+
+    @classmethod
+    def from_env(cls):
+        """Instancie le cache d'après ANSWER_CACHE*, ou None s'il est désactivé"""
+        if os.getenv("ANSWER_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+        )
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        self._matrices.pop(key[0], None)
+
+    def _is_valid(self, key, entry, now: float) -> bool:
+        if now - entry["created"] > self.ttl:
+            return False
+        if collection_updated_at(key[0], self.stamp_dir) > entry["created"]:
+            self.invalidations += 1
+            return False
+        return True
+
+    def lookup(self, collection_name: str, question: str, final: bool = False):
+        """Recherche exacte sur la question normalisée
+
+        final : aucune recherche par similarité ne suivra (route sans embedding), l'échec compte un miss.
+        """
+        key = (collection_name, normalize_question(question))
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._is_valid(key, entry, now):
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry
+            if entry is not None:
+                self._drop(key)
+            if final:
+                self.misses += 1
+            return None
+
+    def _matrix(self, collection_name: str):
+        if collection_name not in self._matrices:
+            keys = [key for key, entry in self.entries.items()
+                    if key[0] == collection_name and entry["embedding"] is not None]
+            vectors = [self.entries[key]["embedding"] for key in keys]
+            matrix = np.vstack(vectors) if vectors else np.zeros((0, 1), dtype=np.float32)
+            self._matrices[collection_name] = (keys, matrix)
+        return self._matrices[collection_name]
+
+    def lookup_similar(self, collection_name: str, embedding: list):
+        """Recherche de la question en cache la plus proche (cosinus ≥ seuil)
+
+        Compte un miss si rien n'est trouvé : à appeler après lookup().
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        now = time.time()
+        with self.lock:
+            keys, matrix = self._matrix(collection_name)
+            if keys and matrix.shape[1] == query.shape[0]:
+                scores = matrix @ query
+                for index in np.argsort(-scores):
+                    if scores[index] < self.similarity:
+                        break
+                    key = keys[index]
+                    entry = self.entries.get(key)
+                    if entry is not None and self._is_valid(key, entry, now):
+                        self.entries.move_to_end(key)
+                        self.semantic_hits += 1
+                        return entry
+                    self._drop(key)
+                    break
+            self.misses += 1
+            return None
+
+    def store(self, collection_name: str, question: str, embedding: list, answer: str, sources: list):
+        """Sans embedding (question routée en BM25 seul), l'entrée ne sert qu'à la recherche exacte"""
+        vector = None
+        if embedding is not None:
+            vector = np.array(embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        key = (collection_name, normalize_question(question))
+        with self.lock:
+            self.entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "embedding": vector,
+                "created": time.time(),
+            }
+            self.entries.move_to_end(key)
+            self._matrices.pop(collection_name, None)
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self._matrices.pop(old_key[0], None)
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,81 @@
+"""
+Découpage des documents en lots pour les appels d'embedding
+Chaque lot respecte une taille maximale et un budget de tokens par requête (tiktoken)
+"""
+
+import time
+from functools import lru_cache
+import tiktoken
+
+# Limite OpenAI : 300 000 tokens par requête d'embedding, on garde une marge
+DEFAULT_MAX_TOKENS_PER_REQUEST = 250_000
+DEFAULT_BATCH_SIZE = 100
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Encodage tiktoken du modèle (cl100k_base pour un modèle inconnu), chargé une fois"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def get_token_counter(model: str):
+    """Retourne une fonction de comptage de tokens adaptée au modèle d'embedding"""
+    encoding = get_encoding(model)
+
+    def count_tokens(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count_tokens
+
+
+def iter_batches(records, batch_size: int, max_tokens: int, count_tokens):
+    """Regroupe les documents en lots bornés en nombre de documents et en tokens
+
+    Chaque document est un dict contenant au moins la clé "text" ; son nombre
+    de tokens est ajouté sous la clé "tokens".
+    Produit des tuples (lot, nombre_de_tokens_du_lot).
+    """
+    batch = []
+    batch_tokens = 0
+
+    for record in records:
+        tokens = count_tokens(record["text"])
+        record["tokens"] = tokens
+
+        # Le lot courant est plein : on l'envoie avant d'ajouter le document
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch, batch_tokens
+            batch = []
+            batch_tokens = 0
+
+        batch.append(record)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch, batch_tokens
+
+
+class ThroughputMeter:
+    """Mesure le débit d'ingestion (lignes/s et tokens/s)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rows = 0
+        self.tokens = 0
+        self.batches = 0
+
+    def add(self, rows: int, tokens: int):
+        self.rows += rows
+        self.tokens += tokens
+        self.batches += 1
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (
+            f"⏱️  {self.rows} lignes / {self.tokens} tokens en {elapsed:.1f}s "
+            f"({self.batches} lots) → "
+            f"{self.rows / elapsed:.1f} lignes/s, {self.tokens / elapsed:.0f} tokens/s"
+        )
@@ -0,0 +1,74 @@
+"""
+Points de reprise de l'ingestion
+La progression est enregistrée après chaque lot validé par Weaviate, dans un fichier d'état local,
+avec un rapport des objets rejetés
+"""
+
+import json
+import os
+import time
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "checkpoints")
+
+
+class IngestCheckpoint:
+    """Fichier d'état d'une ingestion (une collection + une source de données)"""
+
+    def __init__(self, collection_name: str, source: dict, directory: str = DEFAULT_CHECKPOINT_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{collection_name}.json")
+        self.failures_path = os.path.join(directory, f"{collection_name}.failures.jsonl")
+        self.source = source
+        self.rows_committed = 0
+        self.objects_written = 0
+        self.objects_failed = 0
+
+    def load(self) -> int:
+        """Relit l'état précédent et retourne le nombre de lignes déjà validées"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("source") != self.source:
+            print(f"⚠️  Point de reprise ignoré : source différente ({state.get('source')})")
+            return 0
+        self.rows_committed = state["rows_committed"]
+        self.objects_written = state.get("objects_written", 0)
+        self.objects_failed = state.get("objects_failed", 0)
+        return self.rows_committed
+
+    def commit(self, rows_committed: int, written: int, failures: list):
+        """Enregistre la progression après un lot validé (écriture atomique)"""
+        self.rows_committed = rows_committed
+        self.objects_written += written - len(failures)
+        self.objects_failed += len(failures)
+        if failures:
+            self.record_failures(failures)
+
+        state = {
+            "source": self.source,
+            "rows_committed": self.rows_committed,
+            "objects_written": self.objects_written,
+            "objects_failed": self.objects_failed,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record_failures(self, failures: list):
+        """Ajoute les objets rejetés par Weaviate au rapport d'échecs (JSONL)"""
+        with open(self.failures_path, "a", encoding="utf-8") as f:
+            for error in failures:
+                obj = getattr(error, "object_", None)
+                f.write(json.dumps({
+                    "uuid": str(getattr(obj, "uuid", None) or getattr(error, "original_uuid", "")),
+                    "properties": getattr(obj, "properties", None),
+                    "message": error.message,
+                }, ensure_ascii=False, default=str) + "\n")
+
+    def clear(self):
+        """Ingestion terminée : le point de reprise n'a plus lieu d'être"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
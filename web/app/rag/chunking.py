@@ -0,0 +1,156 @@
+"""
+Découpage des documents longs en morceaux avant vectorisation
+Morceaux d'au plus N tokens (tiktoken) en phrases entières, avec chevauchement, rattachés à leur
+document parent (parent_id, chunk_index) ; découpage en streaming sur plusieurs processus
+"""
+
+import itertools
+import multiprocessing
+import os
+import re
+from weaviate.util import generate_uuid5
+from batching import get_encoding
+
+DEFAULT_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "0"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "50"))
+DEFAULT_CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+
+# Coupure possible après une fin de phrase ou de ligne (espaces inclus dans le segment précédent)
+_BOUNDARY = re.compile(r"(?:[.!?]|\n)\s+")
+
+# Découpeur du processus courant, hérité par les workers (fork) : encodage tiktoken chargé une fois
+_chunker = None
+
+
+class Chunker:
+    """Découpe un texte en morceaux d'au plus chunk_tokens tokens, en phrases entières
+
+    Les dernières phrases d'un morceau (au plus overlap tokens) sont répétées au début
+    du suivant. Une phrase plus longue que le morceau est coupée sur les tokens.
+    """
+
+    def __init__(self, model: str, chunk_tokens: int, overlap: int = DEFAULT_CHUNK_OVERLAP):
+        if chunk_tokens <= 0:
+            raise ValueError("La taille des morceaux doit être positive")
+        if not 0 <= overlap < chunk_tokens:
+            raise ValueError(f"Chevauchement invalide : {overlap} (entre 0 et {chunk_tokens - 1} tokens)")
+        self.encoding = get_encoding(model)
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+
+    def _segments(self, text: str):
+        """(texte, tokens) des phrases ; les phrases trop longues sont coupées sur les tokens"""
+        starts = [0] + [match.end() for match in _BOUNDARY.finditer(text)]
+        for start, end in zip(starts, starts[1:] + [len(text)]):
+            segment = text[start:end]
+            if not segment:
+                continue
+            tokens = self.encoding.encode(segment, disallowed_special=())
+            if len(tokens) <= self.chunk_tokens:
+                yield segment, len(tokens)
+                continue
+            step = self.chunk_tokens - self.overlap
+            for i in range(0, len(tokens), step):
+                window = tokens[i:i + step]
+                yield self.encoding.decode(window), len(window)
+
+    def split(self, text: str) -> list:
+        chunks = []
+        current = []
+        total = 0
+        for segment, tokens in self._segments(text):
+            if current and total + tokens > self.chunk_tokens:
+                chunks.append("".join(part for part, _ in current))
+                # Chevauchement : dernières phrases du morceau, sans dépasser la taille avec la phrase suivante
+                kept = []
+                total = 0
+                for part, count in reversed(current):
+                    if total + count > self.overlap or total + count + tokens > self.chunk_tokens:
+                        break
+                    kept.insert(0, (part, count))
+                    total += count
+                current = kept
+            current.append((segment, tokens))
+            total += tokens
+        if current:
+            chunks.append("".join(part for part, _ in current))
+        return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def split_record(record: dict, template: str) -> list:
+    """Documents d'un enregistrement d'ingestion : un par morceau de sa description
+
+    Chaque morceau garde les autres propriétés (titre…), reçoit parent_id (UUID du document, dérivé
+    de son contenu) et chunk_index, et un UUID dérivé des deux et du texte du morceau : un document
+    modifié ou redécoupé (autre taille de morceau) produit de nouveaux objets, et les anciens
+    morceaux sont remplacés (IngestDiff.stale_ids). Le texte vectorisé suit le gabarit de la source.
+    """
+    chunks = _chunker.split(record["properties"]["description"]) or [record["properties"]["description"]]
+    documents = []
+    for index, chunk in enumerate(chunks):
+        properties = {**record["properties"], "description": chunk,
+                      "parent_id": record["uuid"], "chunk_index": index}
+        documents.append({
+            "row": record["row"],
+            "uuid": generate_uuid5(f"{record['uuid']}:{index}:{chunk}"),
+            "properties": properties,
+            "text": template.format_map(properties),
+            # Point de reprise après le dernier morceau du document seulement
+            "last_chunk": index == len(chunks) - 1,
+        })
+    return documents
+
+
+def _split(args: tuple) -> list:
+    return split_record(*args)
+
+
+class ChunkPool:
+    """Découpage parallèle des documents, dans l'ordre de lecture et à mémoire bornée
+
+    Les workers sont créés par fork dès la construction : à instancier avant tout thread
+    ou connexion (gRPC Weaviate) du processus.
+    """
+
+    def __init__(self, model: str, chunk_tokens: int, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                 template: str = "{description}", workers: int = DEFAULT_CHUNK_WORKERS, window: int = 64):
+        global _chunker
+        _chunker = Chunker(model, chunk_tokens, overlap)
+        self.template = template
+        self.workers = max(1, workers)
+        self.window = window * self.workers
+        self.pool = multiprocessing.get_context("fork").Pool(self.workers) if self.workers > 1 else None
+        self.documents = 0
+        self.chunks = 0
+
+    def map(self, records):
+        """Morceaux des documents, par fenêtres : la fenêtre suivante est découpée pendant la consommation"""
+        records = iter(records)
+        pending = None
+        while True:
+            window = [(record, self.template) for record in itertools.islice(records, self.window)]
+            if self.pool is None:
+                result = [_split(item) for item in window]
+            else:
+                result = self.pool.map_async(_split, window, chunksize=16) if window else None
+            if pending is not None:
+                yield from self._flatten(pending if isinstance(pending, list) else pending.get())
+            if not window:
+                return
+            pending = result
+
+    def _flatten(self, results: list):
+        for documents in results:
+            self.documents += 1
+            self.chunks += len(documents)
+            yield from documents
+
+    def report(self) -> str:
+        average = self.chunks / self.documents if self.documents else 0.0
+        return (f"✂️  {self.documents} documents découpés en {self.chunks} morceaux "
+                f"({average:.1f} par document, {self.workers} processus)")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
@@ -0,0 +1,100 @@
+"""
+Construction du contexte envoyé au LLM dans un budget de tokens (tiktoken)
+Les sources sont ajoutées par ordre de pertinence, leurs descriptions compressées
+(espaces, première phrase, troncature) : la latence de génération croît avec le prompt
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from batching import get_encoding
+
+DEFAULT_CONTEXT_MODEL = os.getenv("RAG_CONTEXT_MODEL", "gpt-4o-mini")
+# Budget de tokens du contexte (0 = pas de limite) et plafond par description
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "400"))
+DEFAULT_DESCRIPTION_TOKENS = int(os.getenv("RAG_DESCRIPTION_TOKENS", "60"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+ELLIPSIS = "…"
+
+
+@dataclass
+class Context:
+    """Contexte retenu : texte, tokens, sources effectivement incluses"""
+
+    text: str
+    tokens: int
+    sources: list
+    truncated: int = 0
+    dropped: int = 0
+
+
+def format_source(source: dict, description: str = None) -> str:
+    description = source["description"] if description is None else description
+    return f"- {source['command']} :: {description}\n"
+
+
+class ContextBuilder:
+    """Remplit le budget de tokens avec les sources, dans l'ordre de pertinence de la recherche"""
+
+    def __init__(self, max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+                 description_tokens: int = DEFAULT_DESCRIPTION_TOKENS, model: str = DEFAULT_CONTEXT_MODEL):
+        self.max_tokens = max_tokens
+        self.description_tokens = description_tokens
+        self.model = model
+
+    @property
+    def encoding(self):
+        # Chargé à la première requête : le démarrage du service n'en dépend pas
+        return get_encoding(self.model)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def compress(self, description: str, max_tokens: int) -> str:
+        """Description ramenée à max_tokens : première(s) phrase(s) entière(s), sinon troncature"""
+        description = " ".join(description.split())
+        tokens = self.encoding.encode(description, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return description
+        if max_tokens <= 0:
+            return ""
+        # Phrases entières tant qu'elles tiennent dans le budget
+        kept = ""
+        for sentence in _SENTENCE_END.split(description):
+            candidate = f"{kept} {sentence}".strip()
+            if self.count(candidate) > max_tokens:
+                break
+            kept = candidate
+        if kept:
+            return kept
+        return self.encoding.decode(tokens[:max(max_tokens - 1, 1)]).rstrip() + ELLIPSIS
+
+    def build(self, sources: list) -> Context:
+        if self.max_tokens <= 0:
+            text = "".join(format_source(source) for source in sources)
+            return Context(text, 0, list(sources))
+
+        lines, used, tokens, truncated = [], [], 0, 0
+        for source in sources:
+            description = " ".join((source.get("description") or "").split())
+            compressed = self.compress(description, self.description_tokens) if self.description_tokens > 0 \
+                else description
+            line = format_source(source, compressed)
+            line_tokens = self.count(line)
+            if tokens + line_tokens > self.max_tokens:
+                # Dernière source : description raccourcie au budget restant, commande toujours entière
+                remaining = self.max_tokens - tokens - self.count(format_source(source, ""))
+                if remaining < 8 and used:
+                    break
+                compressed = self.compress(description, remaining)
+                line = format_source(source, compressed)
+                line_tokens = self.count(line)
+            if compressed != description:
+                truncated += 1
+            lines.append(line)
+            used.append(source)
+            tokens += line_tokens
+            if tokens >= self.max_tokens:
+                break
+        return Context("".join(lines), tokens, used, truncated, len(sources) - len(used))
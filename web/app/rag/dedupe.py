@@ -0,0 +1,196 @@
+"""
+Dédoublonnage et diversité des commandes
+Clé canonique de commande (à l'ingestion comme à la requête), fusion des morceaux consécutifs
+d'un même document et sélection MMR (Maximal Marginal Relevance) des sources parmi les candidats
+de la recherche hybride
+"""
+
+import re
+from types import SimpleNamespace
+import numpy as np
+
+_SHORT_FLAGS = re.compile(r"^-[A-Za-z]+$")
+# Commandes dont les options à un tiret sont des mots (find -name, java -jar) : jamais regroupées
+_SINGLE_DASH_LONG = {"find", "java", "gcc", "g++", "cc", "clang", "ffmpeg", "ffprobe", "openssl",
+                     "convert", "mogrify", "xrandr", "xset", "qemu-system-x86_64"}
+_SEPARATORS = {"|", "||", "&&", ";"}
+_PREFIXES = {"sudo", "time", "nice", "nohup"}
+
+
+def _flag_cluster(letters: list, takes_argument: bool) -> str:
+    """Options courtes triées ; la dernière reste en place si un argument peut la suivre (tar -cf x ≠ tar -fc x)"""
+    if not takes_argument:
+        return "-" + "".join(sorted(set(letters)))
+    last = letters[-1]
+    return "-" + "".join(sorted(set(letters[:-1]) - {last})) + last
+
+
+def command_key(command: str) -> str:
+    """Forme canonique d'une commande
+
+    Espaces fusionnés, guillemets unifiés, « ; » final retiré, et options courtes
+    groupées triées : « ls -l -a », « ls -al » et « ls  -la; » ont la même clé.
+    Suivies d'un argument, la dernière option du groupe garde sa place ; les
+    commandes à options longues à un tiret (find -name) ne sont pas regroupées.
+    """
+    tokens = command.strip().rstrip(";").replace('"', "'").split()
+    canonical = []
+    flags = []
+    program = None
+    for token in tokens:
+        if token in _SEPARATORS:
+            program = None
+        elif program is None and token not in _PREFIXES:
+            program = token.rsplit("/", 1)[-1]
+        if _SHORT_FLAGS.match(token) and program not in _SINGLE_DASH_LONG:
+            flags.extend(token[1:])
+            continue
+        if flags:
+            canonical.append(_flag_cluster(flags, takes_argument=not token.startswith("-")))
+            flags = []
+        canonical.append(token)
+    if flags:
+        canonical.append(_flag_cluster(flags, takes_argument=False))
+    return " ".join(canonical)
+
+
+def _object_vector(obj):
+    vector = getattr(obj, "vector", None)
+    if isinstance(vector, dict):
+        vector = vector.get("default") or next(iter(vector.values()), None)
+    return vector
+
+
+def _chunk_index(obj):
+    """Position du morceau dans son document parent, ou None pour un document non découpé"""
+    index = obj.properties.get("chunk_index")
+    if not obj.properties.get("parent_id") or index in (None, ""):
+        return None
+    return int(index)
+
+
+def object_key(obj) -> str:
+    """Identité d'un résultat : morceau de document (parent#index) ou clé canonique de la commande"""
+    index = _chunk_index(obj)
+    if index is not None:
+        return f"{obj.properties['parent_id']}#{index}"
+    return obj.properties.get("command_key") or command_key(obj.properties.get("command", ""))
+
+
+def _join(text: str, following: str) -> str:
+    """Concatène deux morceaux consécutifs sans répéter leur chevauchement (phrases entières)"""
+    if following:
+        position = text.find(following[0], max(0, len(text) - len(following)))
+        while position != -1:
+            if (position == 0 or text[position - 1].isspace()) and following.startswith(text[position:]):
+                return text + following[len(text) - position:]
+            position = text.find(following[0], position + 1)
+    return f"{text} {following}"
+
+
+def _merge_run(run: list) -> tuple:
+    """(meilleur rang, objet) d'une suite de morceaux consécutifs fusionnés en un seul résultat"""
+    rank, best = min(run, key=lambda entry: entry[0])
+    if len(run) == 1:
+        return rank, best
+    description = run[0][1].properties.get("description", "")
+    for _, obj in run[1:]:
+        description = _join(description, obj.properties.get("description", ""))
+    properties = {**best.properties, "description": description, "chunk_index": _chunk_index(run[0][1])}
+    return rank, SimpleNamespace(uuid=best.uuid, properties=properties, vector=getattr(best, "vector", None),
+                                 metadata=getattr(best, "metadata", None))
+
+
+def merge_adjacent_chunks(objects) -> list:
+    """Fusionne les morceaux consécutifs d'un même document parent trouvés par la recherche
+
+    Chaque suite fusionnée prend le rang de son meilleur morceau (et son vecteur, pour MMR) ;
+    les documents non découpés sont laissés tels quels.
+    """
+    entries = []
+    parents = {}
+    for rank, obj in enumerate(objects):
+        if _chunk_index(obj) is None:
+            entries.append((rank, obj))
+        else:
+            key = (obj.properties.get("collection"), obj.properties["parent_id"])
+            parents.setdefault(key, []).append((rank, obj))
+    if not parents:
+        return list(objects)
+
+    for chunks in parents.values():
+        chunks.sort(key=lambda entry: _chunk_index(entry[1]))
+        run = [chunks[0]]
+        for entry in chunks[1:]:
+            if _chunk_index(entry[1]) != _chunk_index(run[-1][1]) + 1:
+                entries.append(_merge_run(run))
+                run = []
+            run.append(entry)
+        entries.append(_merge_run(run))
+    return [obj for _, obj in sorted(entries, key=lambda entry: entry[0])]
+
+
+def unique_candidates(objects) -> list:
+    """Premier objet de chaque clé canonique, dans l'ordre de pertinence"""
+    seen = set()
+    candidates = []
+    for obj in objects:
+        if not obj.properties.get("command"):
+            continue
+        key = object_key(obj)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(obj)
+    return candidates
+
+
+def mmr_select(candidates: list, query_vector, top_k: int, mmr_lambda: float = 0.5) -> list:
+    """Sélection MMR : pertinence pour la question moins redondance avec les sources déjà retenues
+
+    Sans vecteurs (include_vector absent) ou avec des dimensions différentes de celle de la question,
+    l'ordre de pertinence de Weaviate est conservé.
+    """
+    vectors = [_object_vector(obj) for obj in candidates]
+    if (len(candidates) <= top_k or query_vector is None
+            or any(v is None or len(v) != len(query_vector) for v in vectors)):
+        return candidates[:top_k]
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+    query = np.array(query_vector, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+    # Le meilleur résultat hybride (vecteur + BM25) est toujours retenu en premier
+    selected = [0]
+    remaining = set(range(1, len(candidates)))
+    while remaining and len(selected) < top_k:
+        best = max(
+            remaining,
+            key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * max(similarity[i][selected]),
+        )
+        selected.append(best)
+        remaining.discard(best)
+    return [candidates[i] for i in selected]
+
+
+def to_sources(chosen: list) -> list:
+    """Sources retenues au format du contexte et de l'affichage"""
+    sources = []
+    for obj in chosen:
+        source = {"command": obj.properties["command"], "description": obj.properties.get("description", "")}
+        if obj.properties.get("collection"):
+            source["collection"] = obj.properties["collection"]
+        sources.append(source)
+    return sources
+
+
+def select_sources(objects, top_k: int, query_vector=None, mmr_lambda: float = None) -> list:
+    """Sources uniques (clé canonique ou morceaux fusionnés) et diversifiées par MMR si mmr_lambda est fourni"""
+    candidates = unique_candidates(merge_adjacent_chunks(objects))
+    if mmr_lambda is None:
+        chosen = candidates[:top_k]
+    else:
+        chosen = mmr_select(candidates, query_vector, top_k, mmr_lambda)
+    return to_sources(chosen)
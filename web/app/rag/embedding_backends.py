@@ -0,0 +1,162 @@
+"""
+Backends d'embedding interchangeables (EMBEDDING_BACKEND)
+- openai : API OpenAI (ou compatible via OPENAI_BASE_URL)
+- local  : modèle sentence-transformers sur CPU (celui du service text2vec-transformers), sans réseau
+- hash   : vecteurs déterministes dérivés du sha256 du texte, pour les tests
+Chaque collection enregistre la signature backend:modèle:dimension qui l'a vectorisée
+"""
+
+import hashlib
+import math
+import os
+import re
+from dataclasses import dataclass
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("openai", "local", "hash")
+DEFAULT_EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+
+DEFAULT_MODELS = {
+    "openai": "text-embedding-3-small",
+    "local": "sentence-transformers/multi-qa-MiniLM-L6-cos-v1",
+    "hash": "sha256",
+}
+# Dimensions connues sans appel au modèle
+KNOWN_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+    "sentence-transformers/multi-qa-MiniLM-L6-cos-v1": 384,
+    "sha256": 384,
+}
+
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+
+# Signature inscrite dans la description de la collection : « … [embedding openai:text-embedding-3-small:1536] »
+_SIGNATURE = re.compile(r"\[embedding ([^\]\s]+)\]")
+
+
+def hash_embedding(text: str, dimensions: int) -> list:
+    """Vecteur unitaire déterministe dérivé du sha256 du texte"""
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(b / 127.5 - 1.0 for b in digest)
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+class HashEmbeddings(Embeddings):
+    """Embeddings factices et déterministes : même texte, même vecteur, sans réseau"""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self.model = f"hash:sha256:{dimensions}"
+
+    def embed_documents(self, texts: list) -> list:
+        return [hash_embedding(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return hash_embedding(text, self.dimensions)
+
+
+class LocalEmbeddings(Embeddings):
+    """Modèle sentence-transformers chargé une fois, encodage par lots sur tous les cœurs CPU"""
+
+    def __init__(self, model_name: str, batch_size: int = LOCAL_BATCH_SIZE, device: str = None):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError("Backend local : pip install sentence-transformers") from e
+        import torch
+        torch.set_num_threads(os.cpu_count() or 1)
+
+        kwargs = {"device": device or "cpu"}
+        # ONNX Runtime (LOCAL_EMBEDDING_ONNX=1) : inférence CPU plus rapide que PyTorch
+        if os.getenv("LOCAL_EMBEDDING_ONNX", "0").lower() in ("1", "true", "yes"):
+            kwargs["backend"] = "onnx"
+        self.client = SentenceTransformer(model_name, **kwargs)
+        self.batch_size = batch_size
+        self.dimensions = self.client.get_sentence_embedding_dimension()
+        self.model = f"local:{model_name}:{self.dimensions}"
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = self.client.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                     convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+@dataclass
+class EmbeddingBackend:
+    """Backend choisi, modèle et dimension des vecteurs qu'il produit"""
+
+    name: str
+    model: str
+    dimensions: int = None
+
+    @classmethod
+    def from_env(cls, name: str = None, model: str = None):
+        name = name or DEFAULT_EMBEDDING_BACKEND
+        if name not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Backend d'embedding inconnu '{name}' (valeurs : {', '.join(EMBEDDING_BACKENDS)})")
+        model = model or os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS[name]
+        dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+        return cls(name, model, int(dimensions) if dimensions else KNOWN_DIMENSIONS.get(model))
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.model}:{self.dimensions or '?'}"
+
+    def create(self, batch_size: int = None, max_retries: int = None) -> Embeddings:
+        """Instancie le modèle ; batch_size = textes par requête (openai) ou par passe (local)"""
+        if self.name == "hash":
+            return HashEmbeddings(self.dimensions or 384)
+        if self.name == "local":
+            embeddings = LocalEmbeddings(self.model, batch_size or LOCAL_BATCH_SIZE)
+            self.dimensions = embeddings.dimensions
+            return embeddings
+
+        from langchain_openai import OpenAIEmbeddings
+        kwargs = {"model": self.model, "openai_api_key": os.getenv("OPENAI_API_KEY")}
+        if batch_size:
+            kwargs["chunk_size"] = batch_size
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        if os.getenv("EMBEDDING_DIMENSIONS"):
+            kwargs["dimensions"] = self.dimensions
+        return OpenAIEmbeddings(**kwargs)
+
+
+def read_signature(description: str):
+    """Signature enregistrée dans la description d'une collection, ou None"""
+    match = _SIGNATURE.search(description or "")
+    return match.group(1) if match else None
+
+
+def with_signature(description: str, signature: str) -> str:
+    """Description de collection avec la signature d'embedding (remplacée si déjà présente)"""
+    base = _SIGNATURE.sub("", description or "").strip()
+    return f"{base} [embedding {signature}]".strip()
+
+
+def collection_signature(collection):
+    """Signature d'une collection Weaviate (synchrone) ou d'un index local"""
+    meta = getattr(collection, "meta", None)
+    if meta is not None:
+        return meta.get("embedding")
+    return read_signature(collection.config.get().description)
+
+
+def check_signature(collection_name: str, recorded: str, expected: str):
+    """Refuse d'interroger ou d'alimenter une collection vectorisée par un autre backend"""
+    if recorded and expected and recorded != expected:
+        raise ValueError(
+            f"La collection '{collection_name}' a été vectorisée avec {recorded}, "
+            f"incompatible avec le backend courant {expected} (EMBEDDING_BACKEND / EMBEDDING_MODEL)"
+        )
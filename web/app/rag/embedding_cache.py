@@ -0,0 +1,239 @@
+"""
+Cache persistant des embeddings, adressé par contenu
+Clé = (signature du backend, sha256 du texte normalisé), vecteurs float32 dans SQLite,
+LRU en mémoire devant le disque et éviction par taille (moins récemment utilisés d'abord)
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite3")
+
+
+def normalize_text(text: str) -> str:
+    """Normalisation Unicode NFC et espaces compactés"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Clé d'un texte pour un modèle ; model = signature backend:modèle:dimension du backend"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """Cache d'embeddings SQLite + LRU mémoire, partagé entre ingestion, requêtes et Gradio"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 512 * 1024 * 1024,
+                 memory_items: int = 10_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self.db.commit()
+        self.total_bytes = self._stored_bytes()
+
+    @classmethod
+    def from_env(cls):
+        """Instancie le cache d'après EMBEDDING_CACHE*, ou None s'il est désactivé"""
+        if os.getenv("EMBEDDING_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(
+            path=os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024,
+        )
+
+    def _stored_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key: str, vector: list):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Retourne les vecteurs en cache (None pour les absents)"""
+        keys = [cache_key(model, text) for text in texts]
+        vectors = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    vectors[i] = self.memory[key]
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                found = []
+                key_list = list(missing)
+                # SQLite limite le nombre de paramètres par requête
+                for start in range(0, len(key_list), 500):
+                    chunk = key_list[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        self._remember(key, vector)
+                        for i in missing[key]:
+                            vectors[i] = vector
+                        found.append(key)
+
+                if found:
+                    now = time.time()
+                    self.db.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                        [(now, key) for key in found])
+                    self.db.commit()
+
+                hits = sum(len(missing[key]) for key in found)
+                self.disk_hits += hits
+                self.misses += sum(len(indexes) for indexes in missing.values()) - hits
+
+        return vectors
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """Enregistre des vecteurs puis applique l'éviction par taille"""
+        now = time.time()
+        rows = []
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model, text)
+                vector = list(vector)
+                self._remember(key, vector)
+                rows.append((key, array("f", vector).tobytes(), now))
+            before = self.db.total_changes
+            # Clé adressée par contenu : une clé existante contient déjà le même vecteur
+            self.db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self.db.commit()
+            if rows:
+                self.total_bytes += (self.db.total_changes - before) * len(rows[0][1])
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        # Recalcul exact : d'autres processus peuvent écrire dans le même fichier
+        total = self._stored_bytes()
+        self.total_bytes = total
+        if total <= self.max_bytes:
+            return
+        # On redescend à 90 % de la taille maximale pour ne pas évincer à chaque écriture
+        excess = total - int(self.max_bytes * 0.9)
+        removed = 0
+        victims = []
+        cursor = self.db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC")
+        for key, size in cursor:
+            victims.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        cursor.close()
+        self.db.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.db.commit()
+        self.total_bytes -= removed
+        for (key,) in victims:
+            self.memory.pop(key, None)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (
+            f"🗃️  Cache d'embeddings : {self.hits} hits ({self.memory_hits} mémoire, {self.disk_hits} disque), "
+            f"{self.misses} misses → {self.hit_ratio():.0%} de hits"
+        )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Enveloppe Langchain : n'appelle le modèle que pour les textes absents du cache
+
+    Les entrées sont rangées sous la signature du backend (backend:modèle:dimension) : un même
+    modèle réduit à une autre dimension (EMBEDDING_DIMENSIONS) ne partage pas ses vecteurs.
+    """
+
+    def __init__(self, embeddings, cache: EmbeddingCache, signature: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = signature
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.put_many(self.model, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        vector = self.cache.get_many(self.model, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model, [text], [vector])
+        return vector
+
+    # Chemin asynchrone : lectures et écritures SQLite hors de la boucle d'événements
+    async def aembed_documents(self, texts: list) -> list:
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            await asyncio.to_thread(self.cache.put_many, self.model, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> list:
+        vector = (await asyncio.to_thread(self.cache.get_many, self.model, [text]))[0]
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.cache.put_many, self.model, [text], [vector])
+        return vector
+
+
+def with_cache(embeddings, signature: str, cache=None):
+    """Ajoute le cache (configuré par l'environnement) devant un modèle d'embedding créé par un backend"""
+    cache = cache or EmbeddingCache.from_env()
+    return CachedEmbeddings(embeddings, cache, signature) if cache else embeddings
@@ -0,0 +1,78 @@
+"""
+Pool de workers d'embedding concurrents pour l'ingestion
+Les lots sont vectorisés en parallèle sous contrôle du RateLimiter, et restitués dans l'ordre.
+Avec un cache d'embeddings, seuls les textes absents du cache sont envoyés à l'API.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import call_with_backoff
+
+
+class EmbeddingWorkerPool:
+    """Vectorise des lots de documents avec N workers concurrents"""
+
+    def __init__(self, embed_documents, workers: int = 4, limiter=None, max_in_flight: int = 0,
+                 max_retries: int = 6, cache=None, model: str = ""):
+        self.embed_documents = embed_documents
+        self.workers = max(1, workers)
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.max_retries = max_retries
+        self.cache = cache
+        # Espace du cache : signature backend:modèle:dimension
+        self.model = model
+        self.calls = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _on_retry(self, exc, attempt, delay):
+        with self._lock:
+            self.retries += 1
+        print(f"⚠️  Quota API atteint ({exc.__class__.__name__}), nouvel essai {attempt} dans {delay:.1f}s")
+
+    def _embed(self, records, tokens):
+        texts = [record["text"] for record in records]
+        vectors = self.cache.get_many(self.model, texts) if self.cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if not missing:
+            return vectors
+
+        missing_texts = [texts[i] for i in missing]
+        missing_tokens = sum(records[i].get("tokens", 0) for i in missing) or tokens
+
+        def call():
+            if self.limiter:
+                waited = self.limiter.acquire(missing_tokens)
+                with self._lock:
+                    self.throttled_seconds += waited
+            with self._lock:
+                self.calls += 1
+            return self.embed_documents(missing_texts)
+
+        fresh = call_with_backoff(call, max_retries=self.max_retries, on_retry=self._on_retry)
+        if self.cache:
+            self.cache.put_many(self.model, missing_texts, fresh)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        return vectors
+
+    def map(self, batches):
+        """Vectorise les lots (lot, tokens) et produit (lot, tokens, vecteurs) dans l'ordre d'entrée
+
+        Au plus max_in_flight lots sont en cours : le consommateur (insertion Weaviate)
+        travaille pendant que les workers vectorisent les lots suivants.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed") as executor:
+            pending = deque()
+            for records, tokens in batches:
+                pending.append((records, tokens, executor.submit(self._embed, records, tokens)))
+                if len(pending) >= self.max_in_flight:
+                    records_done, tokens_done, future = pending.popleft()
+                    yield records_done, tokens_done, future.result()
+
+            while pending:
+                records_done, tokens_done, future = pending.popleft()
+                yield records_done, tokens_done, future.result()
@@ -0,0 +1,116 @@
+"""
+Évaluation de la recherche
+Paires (question, commande attendue), recall@k, MRR et percentiles de latence,
+export des résultats en JSON et CSV
+"""
+
+import csv
+import json
+import math
+import os
+import time
+from dedupe import command_key, unique_candidates
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "benchmarks")
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentile par rang le plus proche"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def pairs_from_rows(rows, known_keys: set = None, count: int = 200) -> list:
+    """Paires d'évaluation à partir de lignes du dataset (input → output)
+
+    Avec known_keys, seules les lignes dont la commande existe dans la collection sont gardées :
+    sur des lignes non ingérées, ce sont des reformulations de commandes indexées.
+    """
+    pairs = []
+    seen = set()
+    for item in rows:
+        question = (item.get("input") or "").strip()
+        command = (item.get("output") or "").strip()
+        if not question or not command:
+            continue
+        key = command_key(command)
+        if (known_keys is not None and key not in known_keys) or (question, key) in seen:
+            continue
+        seen.add((question, key))
+        pairs.append({"question": question, "command": command, "key": key})
+        if len(pairs) >= count:
+            break
+    return pairs
+
+
+def load_pairs_file(path: str) -> list:
+    """Paires personnalisées : JSONL {"question": ..., "command": ...}"""
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                pairs.append({"question": item["question"], "command": item["command"],
+                              "key": command_key(item["command"])})
+    return pairs
+
+
+def collection_keys(collection) -> set:
+    """Clés canoniques des commandes présentes dans une collection Weaviate ou un index local"""
+    records = getattr(collection, "records", None)
+    if records is None:
+        records = (obj.properties for obj in collection.iterator(return_properties=["command"], cache_size=1000))
+    return {command_key(record.get("command") or "") for record in records}
+
+
+def evaluate(search, pairs: list, embeddings: list, k_values: list, warmup: int = 3) -> dict:
+    """Mesure une configuration de recherche
+
+    search(question, vector) retourne les objets classés ; le rang retenu est celui de la
+    commande attendue parmi les commandes uniques. Seule la recherche est chronométrée :
+    les embeddings des questions sont calculés une fois pour toutes les configurations.
+    """
+    for pair, vector in list(zip(pairs, embeddings))[:warmup]:
+        search(pair["question"], vector)
+
+    latencies = []
+    reciprocal_ranks = []
+    hits = {k: 0 for k in k_values}
+    for pair, vector in zip(pairs, embeddings):
+        start = time.perf_counter()
+        objects = search(pair["question"], vector)
+        latencies.append(time.perf_counter() - start)
+
+        keys = [obj.properties.get("command_key") or command_key(obj.properties.get("command", ""))
+                for obj in unique_candidates(objects)]
+        rank = keys.index(pair["key"]) + 1 if pair["key"] in keys else None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in k_values:
+            if rank and rank <= k:
+                hits[k] += 1
+
+    total = len(pairs) or 1
+    metrics = {f"recall@{k}": hits[k] / total for k in k_values}
+    metrics["mrr"] = sum(reciprocal_ranks) / total
+    for q in (50, 95, 99):
+        metrics[f"p{q}_ms"] = percentile(latencies, q) * 1000 if latencies else 0.0
+    metrics["queries"] = len(pairs)
+    return metrics
+
+
+def write_results(results: list, metadata: dict, directory: str = DEFAULT_RESULTS_DIR, name: str = None) -> dict:
+    """Écrit les résultats (une ligne par configuration) en JSON et CSV, retourne les chemins"""
+    os.makedirs(directory, exist_ok=True)
+    name = name or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}"
+    paths = {"json": os.path.join(directory, f"{name}.json"), "csv": os.path.join(directory, f"{name}.csv")}
+
+    with open(paths["json"], "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=2, ensure_ascii=False)
+
+    columns = list(dict.fromkeys(key for row in results for key in row))
+    with open(paths["csv"], "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+    return paths
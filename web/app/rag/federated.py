@@ -0,0 +1,90 @@
+"""
+Requêtes fédérées sur plusieurs collections
+Même question (et même embedding) envoyée en parallèle à chaque collection, avec un délai
+maximal par collection, puis fusion des classements par Reciprocal Rank Fusion (RRF)
+"""
+
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from dedupe import object_key
+
+# Séparateur des noms de collections fédérées (interdit dans un nom de collection Weaviate)
+SEPARATOR = "+"
+
+DEFAULT_TIMEOUT = float(os.getenv("RAG_COLLECTION_TIMEOUT", "2.0"))
+DEFAULT_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+
+def collection_names(collections) -> list:
+    """Liste de collections à partir d'un nom, de "A,B", "A+B" ou d'une liste (ordre conservé)"""
+    if isinstance(collections, str):
+        collections = re.split(r"[,+]", collections)
+    return list(dict.fromkeys(name.strip() for name in collections if name and name.strip()))
+
+
+def federation_name(collections) -> str:
+    """Nom stable d'un ensemble de collections (clé du cache de réponses et du routeur)"""
+    return SEPARATOR.join(sorted(collection_names(collections)))
+
+
+def reciprocal_rank_fusion(results: dict, k: int = DEFAULT_RRF_K) -> list:
+    """Fusionne les classements {collection: objets} : score = Σ 1 / (k + rang)
+
+    Une même commande (clé canonique) ou un même morceau de document trouvé dans plusieurs collections cumule ses scores
+    et n'apparaît qu'une fois ; la propriété "collection" indique où elle a été trouvée.
+    """
+    scores = {}
+    objects = {}
+    for collection, ranked in results.items():
+        for rank, obj in enumerate(ranked, 1):
+            key = object_key(obj)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            if key not in objects:
+                obj.properties["collection"] = collection
+                objects[key] = obj
+    return [objects[key] for key in sorted(scores, key=lambda key: -scores[key])]
+
+
+def search_collections(search, names: list, timeout: float = DEFAULT_TIMEOUT):
+    """Recherche parallèle (threads) : ({collection: objets}, collections ignorées)
+
+    Une collection qui dépasse le délai ou échoue est ignorée ; si toutes échouent,
+    la première erreur est levée. Chaque requête fédérée a ses propres threads : une
+    recherche trop lente ne peut pas être interrompue, mais n'occupe pas les threads
+    des requêtes suivantes.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="federated")
+    try:
+        futures = {executor.submit(search, name): name for name in names}
+        done, pending = wait(futures, timeout=timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    results, skipped, errors = {}, [futures[future] for future in pending], []
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            skipped.append(futures[future])
+            errors.append(e)
+    if not results and errors:
+        raise errors[0]
+    return {name: results[name] for name in names if name in results}, skipped
+
+
+async def asearch_collections(search, names: list, timeout: float = DEFAULT_TIMEOUT):
+    """Recherche parallèle (asyncio) : ({collection: objets}, collections ignorées)"""
+    outcomes = await asyncio.gather(*(asyncio.wait_for(search(name), timeout) for name in names),
+                                    return_exceptions=True)
+    results, skipped, errors = {}, [], []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, BaseException):
+            skipped.append(name)
+            if not isinstance(outcome, asyncio.TimeoutError):
+                errors.append(outcome)
+        else:
+            results[name] = outcome
+    if not results and errors:
+        raise errors[0]
+    return results, skipped
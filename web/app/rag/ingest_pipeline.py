@@ -0,0 +1,236 @@
+"""
+Étages du pipeline d'ingestion en streaming
+lignes de la source → documents (correspondance des champs) → lots vectorisés → écriture par lots Weaviate,
+avec des files bornées entre les étages pour garder une mémoire constante
+"""
+
+import json
+import queue
+import threading
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
+from dedupe import command_key
+
+_END = object()
+
+
+def bounded_prefetch(iterable, maxsize: int = 1000):
+    """Consomme l'itérable dans un thread dédié via une file bornée
+
+    Le producteur est bloqué quand la file est pleine : l'étage amont ne prend
+    jamais plus de maxsize éléments d'avance sur l'étage aval.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=produce, name="ingest-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        # Arrêt anticipé du consommateur : on libère le producteur
+        stop.set()
+
+
+def record_uuid(properties: dict) -> str:
+    """UUID déterministe dérivé du contenu : une même ligne garde toujours le même identifiant"""
+    return generate_uuid5(json.dumps(properties, sort_keys=True, ensure_ascii=False))
+
+
+def iter_records(dataset, spec, start: int = 0):
+    """Applique la correspondance des champs de la source et prépare le texte à vectoriser
+
+    "row" conserve la position de la ligne dans le dataset (pour les points de reprise).
+    L'UUID est dérivé du contenu : une ligne modifiée reçoit un nouvel identifiant. La clé
+    canonique de la commande (command_key) sert au dédoublonnage des variants (IngestDiff).
+    """
+    for row, item in enumerate(dataset, start):
+        document = spec.to_document(item)
+        if document is None:
+            continue
+        properties, text = document
+        properties = {**properties, "command_key": command_key(properties["command"])}
+        yield {
+            "row": row,
+            "uuid": record_uuid(properties),
+            "properties": properties,
+            "text": text,
+        }
+
+
+def _parent(uuid: str, properties: dict) -> str:
+    """Document d'origine d'un objet : lui-même, ou son parent s'il s'agit d'un morceau"""
+    return str(properties.get("parent_id") or uuid)
+
+
+def fetch_existing_ids(collection) -> dict:
+    """Objets déjà présents dans la collection : UUID → (clé canonique, document parent), sans vecteurs"""
+    return {
+        str(obj.uuid): (obj.properties.get("command_key"), _parent(obj.uuid, obj.properties))
+        for obj in collection.iterator(return_properties=["command_key", "parent_id"], cache_size=1000)
+    }
+
+
+class IngestDiff:
+    """Compare les documents du dataset au contenu de la collection
+
+    Avec dedupe, seul le premier document lu pour une clé canonique est gardé (avec tous
+    ses morceaux) ; les objets de la collection portant cette clé et qui ne correspondent
+    plus à ce document (contenu modifié, autre variant) sont périmés et remplacés. Sans
+    dedupe aussi, les anciens morceaux d'un document redécoupé sont remplacés. En reprise (resume), les lignes précédentes ne sont pas relues : le document
+    déjà présent pour une clé reste le premier lu et rien n'est remplacé.
+    """
+
+    def __init__(self, existing: dict, dedupe: bool = True, resume: bool = False):
+        self.existing = existing
+        self.existing_ids = set(existing)
+        self.dedupe = dedupe
+        self.resume = resume
+        self.seen_ids = set()
+        self.parents = set()
+        # Clé canonique → document retenu pour cette exécution
+        self.owners = {key: parent for key, parent in existing.values() if key} if dedupe and resume else {}
+        self.new = 0
+        self.unchanged = 0
+        self.duplicates = 0
+
+    def select_new(self, records):
+        """Ne laisse passer que les documents absents de la collection"""
+        for record in records:
+            uuid = record["uuid"]
+            if self.dedupe:
+                key = record["properties"]["command_key"]
+                parent = _parent(uuid, record["properties"])
+                if self.owners.setdefault(key, parent) != parent:
+                    self.duplicates += 1
+                    continue
+            if uuid in self.seen_ids:
+                self.duplicates += 1
+                continue
+            self.seen_ids.add(uuid)
+            self.parents.add(_parent(uuid, record["properties"]))
+            if uuid in self.existing_ids:
+                self.unchanged += 1
+                continue
+            self.new += 1
+            yield record
+
+    def stale_ids(self) -> list:
+        """Objets remplacés : même clé canonique (ou même document) qu'un document lu, mais absents de celui-ci"""
+        if self.resume:
+            return []
+        return sorted(uuid for uuid, (key, parent) in self.existing.items()
+                      if uuid not in self.seen_ids and (key in self.owners or parent in self.parents))
+
+    def vanished_ids(self) -> list:
+        """Objets de la collection qui n'existent plus dans le dataset"""
+        return sorted(self.existing_ids - self.seen_ids - set(self.stale_ids()))
+
+
+def delete_objects(collection, uuids: list, chunk_size: int = 1000) -> int:
+    """Supprime des objets par identifiant, par paquets"""
+    deleted = 0
+    for start in range(0, len(uuids), chunk_size):
+        chunk = uuids[start:start + chunk_size]
+        result = collection.data.delete_many(where=Filter.by_id().contains_any(chunk))
+        deleted += result.successful
+    return deleted
+
+
+def _batch_failures(collection, batch, closed: bool):
+    """Objets rejetés depuis l'ouverture du contexte de batch, ou None s'ils ne sont pas lisibles
+
+    collection.batch.failed_objects (API publique) n'est rempli qu'à la sortie du contexte, et vidé
+    à l'ouverture du suivant : en cours d'ingestion, on lit la liste du batch actif (attribut privé
+    de weaviate-client 4.17, version fixée dans requirements.txt) quand number_errors en signale.
+    """
+    if closed:
+        return list(collection.batch.failed_objects)
+    if not batch.number_errors:
+        return []
+    results = getattr(batch, "_BatchBase__results_for_wrapper", None)
+    failed_objects = getattr(results, "failed_objects", None)
+    return None if failed_objects is None else list(failed_objects)
+
+
+def write_batches(collection, embedded_batches, batch_size: int = 200, concurrent_requests: int = 2,
+                  on_batch=None, commit_every: int = 0, on_commit=None):
+    """Écrit les lots vectorisés via le batcher Weaviate à taille fixe
+
+    Le batcher envoie les objets par paquets de batch_size en arrière-plan,
+    pendant que les lots suivants sont vectorisés. Tous les commit_every lots,
+    le batcher est vidé puis on_commit(dernier_document, objets_écrits, nouveaux_échecs, ligne_bloquante)
+    est appelé ; ligne_bloquante est la première ligne dont un objet a été rejeté (None sinon) :
+    le point de reprise ne doit pas la dépasser. Retourne le nombre d'objets envoyés.
+    """
+    written = 0
+    pending_records = 0
+    pending_rows = {}
+    last_record = None
+    failures_seen = 0
+    first_failed_row = None
+
+    def commit(batch, closed: bool = False):
+        nonlocal pending_records, failures_seen, first_failed_row
+        failures = _batch_failures(collection, batch, closed)
+        default_row = min(pending_rows.values(), default=last_record["row"])
+        if failures is None:
+            # Rejets signalés mais illisibles (autre version du client) : point de reprise bloqué
+            # au début des objets en attente, détail des rejets à la sortie du contexte
+            failures = []
+            first_failed_row = default_row if first_failed_row is None else min(first_failed_row, default_row)
+        new_failures = failures[failures_seen:]
+        for error in new_failures:
+            uuid = error.original_uuid or getattr(error.object_, "uuid", None)
+            row = pending_rows.get(str(uuid), default_row)
+            first_failed_row = row if first_failed_row is None else min(first_failed_row, row)
+        on_commit(last_record, pending_records, new_failures, first_failed_row)
+        failures_seen = max(failures_seen, len(failures))
+        pending_records = 0
+        pending_rows.clear()
+
+    with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+        for chunk_index, (records, tokens, vectors) in enumerate(embedded_batches, 1):
+            for record, vector in zip(records, vectors):
+                batch.add_object(properties=record["properties"], uuid=record["uuid"], vector=vector)
+                if on_commit:
+                    pending_rows[str(record["uuid"])] = record["row"]
+            written += len(records)
+            pending_records += len(records)
+            last_record = records[-1]
+            if on_batch:
+                on_batch(records, tokens)
+            if on_commit and commit_every and chunk_index % commit_every == 0:
+                batch.flush()
+                commit(batch)
+
+    # Sortie du contexte : tous les objets restants ont été envoyés
+    if on_commit and (pending_records or len(collection.batch.failed_objects) > failures_seen):
+        commit(batch, closed=True)
+    return written
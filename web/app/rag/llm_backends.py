@@ -0,0 +1,205 @@
+"""
+Backends de génération interchangeables (LLM_BACKEND)
+- openai : ChatOpenAI (gpt-4o-mini par défaut)
+- local  : serveur local compatible OpenAI (llama.cpp, vLLM, Ollama…) via LLM_BASE_URL
+- fake   : réponses déterministes construites à partir du contexte, pour les tests de charge
+Les prompts identiques en cours de génération partagent un seul appel au backend (coalescing)
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+LLM_BACKENDS = ("openai", "local", "fake")
+DEFAULT_LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+DEFAULT_LLM_MODELS = {"openai": "gpt-4o-mini", "local": "local-model", "fake": "fake"}
+# Port d'Ollama : 8080 est celui de Weaviate (WEAVIATE_HTTP_PORT), 8000 celui du service de requêtes
+DEFAULT_LOCAL_BASE_URL = "http://127.0.0.1:11434/v1"
+
+# Première source du contexte : « - commande :: description »
+_SOURCE_LINE = re.compile(r"^- (.+?) :: (.*)$", re.MULTILINE)
+
+
+class FakeLLM:
+    """LLM factice : propose la première commande du contexte, latence et débit de tokens réglables"""
+
+    def __init__(self, latency: float = 0.0, tokens: int = 20):
+        self.latency = latency
+        self.tokens = max(1, tokens)
+        self.model_name = "fake"
+
+    def _answer(self, prompt: str) -> str:
+        match = _SOURCE_LINE.search(prompt)
+        if not match:
+            return "Aucune commande trouvée dans le contexte."
+        return f"```bash\n{match.group(1)}\n```\n{match.group(2)}"
+
+    def _chunks(self, prompt: str) -> list:
+        # Réponse découpée en `tokens` morceaux de taille voisine
+        text = self._answer(prompt)
+        size = max(1, -(-len(text) // self.tokens))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def invoke(self, prompt: str) -> AIMessage:
+        time.sleep(self.latency)
+        return AIMessage(content=self._answer(prompt))
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self._answer(prompt))
+
+    async def astream(self, prompt: str):
+        chunks = self._chunks(prompt)
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            yield AIMessageChunk(content=chunk)
+
+
+class _Broadcast:
+    """Flux de génération partagé : les morceaux déjà produits puis les suivants, pour chaque abonné"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, stream):
+        try:
+            async for chunk in stream:
+                async with self.changed:
+                    self.chunks.append(chunk)
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.done or len(self.chunks) > position)
+                chunks = self.chunks[position:]
+                done = self.done
+            for chunk in chunks:
+                yield chunk
+            position += len(chunks)
+            if done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class CoalescingLLM:
+    """Un seul appel au backend pour des prompts identiques en cours de génération
+
+    Les appels suivants attendent le résultat du premier (invoke, ainvoke) ou reçoivent
+    les mêmes morceaux (astream), déjà produits puis au fil de l'eau.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.apending = {}
+        self.streams = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _count(self, shared: bool):
+        with self.lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.calls += 1
+
+    def invoke(self, prompt: str):
+        with self.lock:
+            future = self.pending.get(prompt)
+            owner = future is None
+            if owner:
+                future = self.pending[prompt] = Future()
+        self._count(not owner)
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self.llm.invoke(prompt))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.pending[prompt]
+        return future.result()
+
+    async def ainvoke(self, prompt: str):
+        task = self.apending.get(prompt)
+        self._count(task is not None)
+        if task is None:
+            task = self.apending[prompt] = asyncio.ensure_future(self.llm.ainvoke(prompt))
+            task.add_done_callback(lambda _: self.apending.pop(prompt, None))
+        # shield : l'annulation d'un abonné n'interrompt pas la génération des autres
+        return await asyncio.shield(task)
+
+    async def astream(self, prompt: str):
+        broadcast = self.streams.get(prompt)
+        self._count(broadcast is not None)
+        if broadcast is None:
+            broadcast = self.streams[prompt] = _Broadcast()
+            task = asyncio.ensure_future(broadcast.publish(self.llm.astream(prompt)))
+            task.add_done_callback(lambda _: self.streams.pop(prompt, None))
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.calls + self.coalesced
+            return {"calls": self.calls, "coalesced": self.coalesced,
+                    "coalesced_ratio": self.coalesced / total if total else 0.0}
+
+
+@dataclass
+class LLMBackend:
+    """Backend de génération choisi et son modèle"""
+
+    name: str
+    model: str
+    base_url: str = None
+
+    @classmethod
+    def from_env(cls, name: str = None, model: str = None):
+        name = name or DEFAULT_LLM_BACKEND
+        if name not in LLM_BACKENDS:
+            raise ValueError(f"Backend LLM inconnu '{name}' (valeurs : {', '.join(LLM_BACKENDS)})")
+        model = model or os.getenv("LLM_MODEL") or DEFAULT_LLM_MODELS[name]
+        base_url = os.getenv("LLM_BASE_URL", DEFAULT_LOCAL_BASE_URL) if name == "local" else None
+        return cls(name, model, base_url)
+
+    @property
+    def description(self) -> str:
+        return f"{self.name}:{self.model}" + (f" ({self.base_url})" if self.base_url else "")
+
+    def create(self, temperature: float = 0.0, coalesce: bool = None):
+        """Instancie le LLM, derrière le coalescing sauf LLM_COALESCE=0"""
+        if self.name == "fake":
+            llm = FakeLLM(float(os.getenv("FAKE_LLM_LATENCY", "0.0")), int(os.getenv("FAKE_LLM_TOKENS", "20")))
+        else:
+            from langchain_openai import ChatOpenAI
+            kwargs = {"model": self.model, "temperature": temperature}
+            if self.name == "local":
+                # Les serveurs locaux ignorent la clé mais le client OpenAI en exige une
+                kwargs.update(base_url=self.base_url, api_key=os.getenv("LLM_API_KEY", "local"))
+            else:
+                kwargs["openai_api_key"] = os.getenv("OPENAI_API_KEY")
+            llm = ChatOpenAI(**kwargs)
+
+        if coalesce is None:
+            coalesce = os.getenv("LLM_COALESCE", "1").lower() not in ("0", "false", "no", "off")
+        return CoalescingLLM(llm) if coalesce else llm
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test de charge du chemin de requête asynchrone de l'interface Gradio
+Simule 1, 10 et 50 utilisateurs simultanés contre des backends factices (embedding, Weaviate, LLM)
+et affiche les latences p50/p95
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from evaluation import percentile
+from llm_backends import CoalescingLLM, FakeLLM
+from retrieval import RetrievalEngine
+
+
+class StubEmbeddings:
+    """Embedding factice : latence fixe, vecteur constant"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def aembed_query(self, text: str) -> list:
+        await asyncio.sleep(self.latency)
+        return [0.0] * 1536
+
+
+class StubClient:
+    """Client Weaviate factice : recherche hybride avec latence fixe"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.query = self
+
+    async def collection(self, collection_name: str):
+        return self
+
+    async def hybrid(self, query, vector, alpha, limit, include_vector=False):
+        await asyncio.sleep(self.latency)
+        objects = [
+            SimpleNamespace(properties={"command": f"cmd-{i % 6}", "description": f"description {i}"},
+                            vector=[float(i % 6 == j) for j in range(len(vector))] if include_vector else None)
+            for i in range(limit)
+        ]
+        return SimpleNamespace(objects=objects)
+
+
+class StubPrompt:
+    def format(self, **kwargs) -> str:
+        return "{question}\n{context}".format(**kwargs)
+
+
+async def run_level(rag, users: int, requests_per_user: int, concurrency_limit: int, stream: bool,
+                    same_question: bool = False):
+    """Lance `users` utilisateurs qui enchaînent chacun leurs requêtes
+
+    Avec same_question, tous posent la même question au même moment (rafale de doublons).
+    Retourne (latences totales, temps jusqu'au premier token).
+    """
+    # Le sémaphore joue le rôle de la limite de concurrence de la file Gradio
+    gate = asyncio.Semaphore(concurrency_limit)
+    latencies = []
+    first_tokens = []
+
+    async def user(user_id: int):
+        for i in range(requests_per_user):
+            question = f"question {i}" if same_question else f"question {user_id}-{i}"
+            start = time.perf_counter()
+            async with gate:
+                if stream:
+                    first_token = None
+                    async for kind, _ in rag.astream(question, "LoadTest"):
+                        if kind == "token" and first_token is None:
+                            first_token = time.perf_counter() - start
+                    first_tokens.append(first_token)
+                else:
+                    await rag.aask(question, "LoadTest")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(user(u) for u in range(users)))
+    return latencies, first_tokens or latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Test de charge du chemin async Gradio (backends factices)")
+    parser.add_argument("--users", default="1,10,50", help="Niveaux de concurrence à tester")
+    parser.add_argument("--requests", type=int, default=5, help="Requêtes par utilisateur")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--concurrency-limit", type=int, default=16,
+                        help="Limite de concurrence Gradio simulée (GRADIO_CONCURRENCY)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Attend la réponse complète (ainvoke) au lieu du streaming (astream)")
+    parser.add_argument("--same-question", action="store_true",
+                        help="Tous les utilisateurs posent la même question simultanément")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Un appel LLM par requête, même pour des prompts identiques simultanés")
+    args = parser.parse_args()
+
+    # LLM factice déterministe (LLM_BACKEND=fake), derrière le regroupement des prompts identiques
+    llm = FakeLLM(args.llm_latency, tokens=20)
+    if not args.no_coalesce:
+        llm = CoalescingLLM(llm)
+    rag = RetrievalEngine(
+        StubEmbeddings(args.embed_latency),
+        llm,
+        StubPrompt(),
+        async_client=StubClient(args.search_latency),
+        alpha=0.5, limit=6, top_k=4, mmr_lambda=0.5, routing=False,
+    )
+
+    print("🏋️  Test de charge du chemin de requête async (backends factices)")
+    print(f"   embedding {args.embed_latency * 1000:.0f} ms, recherche {args.search_latency * 1000:.0f} ms, "
+          f"LLM {args.llm_latency * 1000:.0f} ms, limite de concurrence {args.concurrency_limit}")
+    print("=" * 70)
+    print(f"{'Utilisateurs':>12} {'Requêtes':>9} {'p50 (ms)':>10} {'p95 (ms)':>10} "
+          f"{'TTFT p50':>10} {'TTFT p95':>10} {'Débit (req/s)':>14}")
+
+    for users in [int(u) for u in args.users.split(",")]:
+        start = time.perf_counter()
+        latencies, first_tokens = await run_level(rag, users, args.requests, args.concurrency_limit,
+                                                  stream=not args.no_stream, same_question=args.same_question)
+        elapsed = time.perf_counter() - start
+        print(f"{users:>12} {len(latencies):>9} {percentile(latencies, 50) * 1000:>10.0f} "
+              f"{percentile(latencies, 95) * 1000:>10.0f} {percentile(first_tokens, 50) * 1000:>10.0f} "
+              f"{percentile(first_tokens, 95) * 1000:>10.0f} {len(latencies) / elapsed:>14.1f}")
+
+    if isinstance(llm, CoalescingLLM):
+        stats = llm.stats()
+        print(f"\n🔗 {stats['calls']} appels LLM, {stats['coalesced']} requêtes regroupées "
+              f"({stats['coalesced_ratio']:.0%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
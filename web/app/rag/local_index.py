@@ -0,0 +1,249 @@
+"""
+Index vectoriel local (en mémoire, sans Weaviate)
+Export d'une collection vers une matrice float32 mappée en mémoire et un fichier de propriétés,
+puis recherche hybride dans le processus : cosinus top-k vectorisé (NumPy) et score BM25
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from types import SimpleNamespace
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "LOCAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "indexes")
+)
+
+# Paramètres BM25 par défaut de Weaviate
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Découpage en mots minuscules (équivalent de la tokenisation « word » de Weaviate)"""
+    return _WORD.findall(text.lower())
+
+
+def index_paths(collection_name: str, directory: str = DEFAULT_INDEX_DIR) -> dict:
+    base = os.path.join(directory, collection_name)
+    return {
+        "vectors": f"{base}.f32",
+        "properties": f"{base}.jsonl",
+        "meta": f"{base}.json",
+    }
+
+
+def export_collection(collection, collection_name: str, directory: str = DEFAULT_INDEX_DIR,
+                      properties: tuple = ("command", "description", "command_key", "parent_id", "chunk_index"),
+                      embedding: str = None) -> dict:
+    """Exporte les vecteurs (normalisés) et les propriétés d'une collection Weaviate
+
+    Les objets sont lus par le curseur de Weaviate et écrits au fil de l'eau :
+    la mémoire reste constante quelle que soit la taille de la collection.
+    Les fichiers sont remplacés atomiquement en fin d'export. Retourne les métadonnées,
+    dont la signature d'embedding de la collection (embedding_backends).
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = index_paths(collection_name, directory)
+    # parent_id / chunk_index n'existent que dans les collections créées ou alimentées avec découpage
+    available = {prop.name for prop in collection.config.get().properties}
+    properties = [name for name in properties if name in available]
+    count = 0
+    dimension = None
+
+    with open(paths["vectors"] + ".tmp", "wb") as vectors_file, \
+            open(paths["properties"] + ".tmp", "w", encoding="utf-8") as properties_file:
+        for obj in collection.iterator(include_vector=True, return_properties=list(properties),
+                                       cache_size=1000):
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            if not vector:
+                continue
+            vector = np.asarray(vector, dtype=np.float32)
+            if dimension is None:
+                dimension = vector.shape[0]
+            elif vector.shape[0] != dimension:
+                raise ValueError(f"Dimension incohérente : {vector.shape[0]} au lieu de {dimension}")
+            vector /= np.linalg.norm(vector) or 1.0
+            vector.tofile(vectors_file)
+            record = {"uuid": str(obj.uuid)}
+            record.update({name: "" if obj.properties.get(name) is None else obj.properties[name]
+                           for name in properties})
+            properties_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+
+    meta = {"collection": collection_name, "count": count, "dimension": dimension or 0, "normalized": True,
+            "embedding": embedding}
+    with open(paths["meta"] + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    for key in ("vectors", "properties", "meta"):
+        os.replace(paths[key] + ".tmp", paths[key])
+    return meta
+
+
+class BM25Scorer:
+    """Score BM25 sur command + description, avec un index inversé en tableaux NumPy"""
+
+    def __init__(self, documents: list, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        postings = {}
+        for doc_id, text in enumerate(documents):
+            terms = Counter(tokenize(text))
+            lengths[doc_id] = sum(terms.values())
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        average = float(lengths.mean()) if self.size else 0.0
+        # Normalisation de longueur précalculée : k1 * (1 - b + b * dl / avgdl)
+        self.norms = k1 * (1 - b + b * lengths / (average or 1.0))
+        self.postings = {}
+        for term, entries in postings.items():
+            ids = np.fromiter((doc_id for doc_id, _ in entries), dtype=np.int64, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = math.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[term] = (ids, tfs, idf)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self.norms[ids])
+        return scores
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, du meilleur au moins bon"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    """Mise à l'échelle min-max dans [0, 1] (fusion relativeScoreFusion de Weaviate)"""
+    if scores.size == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-12:
+        return np.ones_like(scores) if high > 0 else np.zeros_like(scores)
+    return (scores - low) / (high - low)
+
+
+class LocalIndex:
+    """Collection exportée, interrogeable avec la même interface que query.hybrid de Weaviate"""
+
+    def __init__(self, collection_name: str, directory: str = DEFAULT_INDEX_DIR):
+        paths = index_paths(collection_name, directory)
+        if not os.path.exists(paths["meta"]):
+            raise FileNotFoundError(
+                f"Index local '{collection_name}' introuvable : lancez 08_export_local_index.py {collection_name}"
+            )
+        with open(paths["meta"], encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.name = collection_name
+        count, dimension = self.meta["count"], self.meta["dimension"]
+        # Matrice projetée en mémoire : seules les pages lues sont chargées
+        self.vectors = (np.memmap(paths["vectors"], dtype=np.float32, mode="r", shape=(count, dimension))
+                        if count else np.zeros((0, dimension), dtype=np.float32))
+        with open(paths["properties"], encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f]
+        self.scorer = BM25Scorer([f"{r.get('command', '')} {r.get('description', '')}" for r in self.records])
+        self.query = self
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _object(self, index: int, score: float, include_vector: bool):
+        record = self.records[index]
+        properties = {key: value for key, value in record.items() if key != "uuid"}
+        return SimpleNamespace(
+            uuid=record["uuid"],
+            properties=properties,
+            vector={"default": self.vectors[index].tolist()} if include_vector else {},
+            metadata=SimpleNamespace(score=float(score)),
+        )
+
+    def near_vector(self, near_vector, limit: int = 10, include_vector: bool = False):
+        """Cosinus top-k (vecteurs normalisés à l'export : un produit scalaire suffit)"""
+        query = np.array(near_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.vectors @ query
+        return SimpleNamespace(objects=[self._object(i, scores[i], include_vector)
+                                        for i in _top_k(scores, limit)])
+
+    def bm25(self, query: str, limit: int = 10, include_vector: bool = False):
+        scores = self.scorer.scores(query)
+        return SimpleNamespace(objects=[self._object(i, scores[i], include_vector)
+                                        for i in _top_k(scores, limit) if scores[i] > 0])
+
+    def hybrid(self, query: str, vector=None, alpha: float = 0.5, limit: int = 10,
+               include_vector: bool = False, **kwargs):
+        """Fusion des scores vectoriel et BM25 normalisés : alpha * vecteur + (1 - alpha) * BM25
+
+        Comme Weaviate, chaque recherche fournit ses meilleurs candidats avant la fusion.
+        """
+        candidates = max(limit, 100)
+        fused = {}
+        if vector is not None and alpha > 0:
+            query_vector = np.array(vector, dtype=np.float32)
+            query_vector /= np.linalg.norm(query_vector) or 1.0
+            scores = self.vectors @ query_vector
+            top = _top_k(scores, candidates)
+            for i, score in zip(top, _normalize(scores[top])):
+                fused[int(i)] = fused.get(int(i), 0.0) + alpha * float(score)
+        if query and alpha < 1:
+            scores = self.scorer.scores(query)
+            top = [i for i in _top_k(scores, candidates) if scores[i] > 0]
+            for i, score in zip(top, _normalize(scores[top])):
+                fused[int(i)] = fused.get(int(i), 0.0) + (1 - alpha) * float(score)
+        ranked = sorted(fused.items(), key=lambda item: -item[1])[:limit]
+        return SimpleNamespace(objects=[self._object(i, score, include_vector) for i, score in ranked])
+
+
+class _AsyncLocalQuery:
+    """Adaptateur async : la recherche locale est assez rapide pour s'exécuter dans la boucle"""
+
+    def __init__(self, index: LocalIndex):
+        self.index = index
+        self.query = self
+
+    async def hybrid(self, **kwargs):
+        return self.index.hybrid(**kwargs)
+
+    async def bm25(self, **kwargs):
+        return self.index.bm25(**kwargs)
+
+
+class LocalClient:
+    """Remplace les clients Weaviate sync et async du moteur RAG par les index locaux"""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR):
+        self.directory = directory
+        self.indexes = {}
+        self.collections = self
+
+    def get(self, collection_name: str) -> LocalIndex:
+        if collection_name not in self.indexes:
+            self.indexes[collection_name] = LocalIndex(collection_name, self.directory)
+        return self.indexes[collection_name]
+
+    async def collection(self, collection_name: str):
+        return _AsyncLocalQuery(self.get(collection_name))
+
+    def list_collections(self) -> list:
+        """Collections exportées dans le répertoire des index"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def close(self):
+        self.indexes.clear()
@@ -0,0 +1,166 @@
+"""
+Métriques Prometheus et traces par requête du pipeline RAG
+Histogrammes de durée par étape (embed, search, dedupe, rerank, generate), premier token, tokens du prompt
+et de la réponse, caches et erreurs ; spans par étape avec RAG_TRACING=log (JSON) ou otel (OpenTelemetry)
+"""
+
+import json
+import os
+import uuid
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+# Traces : off (défaut), log (une ligne JSON par requête) ou otel (API OpenTelemetry, SDK configuré à part)
+TRACING = os.getenv("RAG_TRACING", "off").lower()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Durée d'une étape du pipeline RAG", ["stage", "route"],
+                          buckets=LATENCY_BUCKETS)
+REQUEST_SECONDS = Histogram("rag_request_seconds", "Durée totale d'une requête RAG", ["route", "cached"],
+                            buckets=LATENCY_BUCKETS)
+FIRST_TOKEN_SECONDS = Histogram("rag_first_token_seconds", "Temps jusqu'au premier token diffusé",
+                                buckets=LATENCY_BUCKETS)
+TOKENS = Histogram("rag_llm_tokens", "Tokens par appel au LLM", ["direction"], buckets=TOKEN_BUCKETS)
+ANSWER_CACHE = Counter("rag_answer_cache_requests_total", "Questions servies ou non par le cache de réponses",
+                       ["result"])
+COLLECTIONS_SKIPPED = Counter("rag_collections_skipped_total",
+                              "Collections ignorées d'une requête fédérée (délai dépassé ou erreur)")
+ERRORS = Counter("rag_errors_total", "Requêtes en erreur", ["source", "type"])
+RERANKS = Counter("rag_rerank_total", "Candidats reclassés, par reclasseur (lexical : repli hors budget)",
+                  ["reranker"])
+
+
+class SourceCounters:
+    """Compteurs tenus par le cache d'embeddings et le LLM, exposés en Counter Prometheus à chaque collecte
+
+    Ils ne font que croître pendant la vie du processus : rate() et increase() s'appliquent,
+    et un redémarrage est vu comme une remise à zéro de compteur.
+    """
+
+    def __init__(self):
+        self.cache = None
+        self.llm = None
+
+    def collect(self):
+        if self.cache is not None:
+            lookups = CounterMetricFamily("rag_embedding_cache_lookups", "Consultations du cache d'embeddings",
+                                          labels=["result"])
+            lookups.add_metric(["memory_hit"], self.cache.memory_hits)
+            lookups.add_metric(["disk_hit"], self.cache.disk_hits)
+            lookups.add_metric(["miss"], self.cache.misses)
+            yield lookups
+        if self.llm is not None:
+            calls = CounterMetricFamily("rag_llm_calls", "Générations lancées ou regroupées avec une génération en cours",
+                                        labels=["kind"])
+            calls.add_metric(["upstream"], self.llm.calls)
+            calls.add_metric(["coalesced"], self.llm.coalesced)
+            yield calls
+
+
+SOURCE_COUNTERS = SourceCounters()
+REGISTRY.register(SOURCE_COUNTERS)
+
+
+def render() -> tuple:
+    """Corps et type de contenu de la réponse /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class LogTracer:
+    """Spans écrits en une ligne JSON par requête (journal du conteneur)"""
+
+    def emit(self, answer):
+        timings = answer.timings
+        print(json.dumps({
+            "trace_id": uuid.uuid4().hex,
+            "name": "rag.request",
+            "collection": answer.collection,
+            "route": answer.route.name if answer.route else None,
+            "cached": answer.cached,
+            "reranker": answer.reranker,
+            "duration_ms": round(timings.total * 1000, 1),
+            "spans": [{"name": f"rag.{name}", "start_ms": round(start * 1000, 1),
+                       "duration_ms": round((end - start) * 1000, 1), "error": failed}
+                      for name, start, end, failed in timings.spans],
+        }, ensure_ascii=False), flush=True)
+
+
+class OtelTracer:
+    """Spans OpenTelemetry a posteriori (horodatages réels de chaque étape) sous un span racine"""
+
+    def __init__(self):
+        from opentelemetry import trace
+        self.trace = trace
+        self.tracer = trace.get_tracer("wikirag.rag")
+
+    def emit(self, answer):
+        timings = answer.timings
+        origin = int(timings.started_at * 1e9)
+        root = self.tracer.start_span("rag.request", start_time=origin, attributes={
+            "rag.collection": answer.collection,
+            "rag.route": answer.route.name if answer.route else "",
+            "rag.cached": answer.cached,
+            "rag.reranker": answer.reranker or "",
+            "rag.prompt_tokens": answer.prompt_tokens or 0,
+        })
+        context = self.trace.set_span_in_context(root)
+        for name, start, end, failed in timings.spans:
+            span = self.tracer.start_span(f"rag.{name}", context=context, start_time=origin + int(start * 1e9))
+            if failed:
+                span.set_status(self.trace.StatusCode.ERROR)
+            span.end(end_time=origin + int(end * 1e9))
+        root.end(end_time=origin + int(timings.total * 1e9))
+
+
+def make_tracer(mode: str = TRACING):
+    if mode == "log":
+        return LogTracer()
+    if mode == "otel":
+        return OtelTracer()
+    return None
+
+
+class PipelineMetrics:
+    """Enregistre chaque réponse du moteur RAG (RetrievalEngine(metrics=...)) dans les métriques et traces"""
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer if tracer is not None else make_tracer()
+        self.answer_cache = None
+
+    def observe(self, answer):
+        timings = answer.timings
+        route = answer.route.name if answer.route else "none"
+        for stage in dict.fromkeys(name for name, *_ in timings.spans):
+            STAGE_SECONDS.labels(stage, route).observe(getattr(timings, stage))
+        REQUEST_SECONDS.labels(route, str(answer.cached).lower()).observe(timings.total)
+        # Cache de réponses désactivé : ni hit ni miss
+        if self.answer_cache is not None:
+            ANSWER_CACHE.labels("hit" if answer.cached else "miss").inc()
+        if answer.skipped:
+            COLLECTIONS_SKIPPED.inc(len(answer.skipped))
+        if answer.reranker:
+            RERANKS.labels(answer.reranker).inc()
+        if not answer.cached:
+            if timings.first_token is not None:
+                FIRST_TOKEN_SECONDS.observe(timings.first_token)
+            if answer.prompt_tokens is not None:
+                TOKENS.labels("in").observe(answer.prompt_tokens)
+            if answer.completion_tokens is not None:
+                TOKENS.labels("out").observe(answer.completion_tokens)
+        if self.tracer is not None:
+            self.tracer.emit(answer)
+
+    def error(self, source: str, exc: Exception):
+        ERRORS.labels(source, exc.__class__.__name__).inc()
+
+    def watch(self, embeddings=None, llm=None, answer_cache=None):
+        """Expose les compteurs du cache d'embeddings et du regroupement des générations
+
+        answer_cache : cache de réponses du moteur (None s'il est désactivé)
+        """
+        self.answer_cache = answer_cache
+        SOURCE_COUNTERS.cache = getattr(embeddings, "cache", None)
+        if hasattr(llm, "stats"):
+            SOURCE_COUNTERS.llm = llm
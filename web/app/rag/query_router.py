@@ -0,0 +1,195 @@
+"""
+Routage des questions : mots-clés seuls (BM25), vecteur seul ou hybride
+Classification par heuristiques sur les tokens de la question, sans appel réseau :
+une question qui cite une commande est servie par BM25 sans calculer son embedding
+Le vocabulaire du routeur est construit à l'ingestion (02/11) et enregistré par collection :
+aucun parcours de la collection sur le chemin des requêtes
+"""
+
+import itertools
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from local_index import tokenize
+
+ROUTES = ("keyword", "vector", "hybrid")
+DEFAULT_ROUTER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "routers")
+# Objets lus au plus pour une collection ingérée sans vocabulaire enregistré (parcours en arrière-plan)
+ROUTER_SCAN_LIMIT = int(os.getenv("RAG_ROUTER_SCAN_LIMIT", "50000"))
+ROUTER_PROPERTIES = ["command", "description"]
+
+# Syntaxe de commande : option (-av, --recursive), chemin absolu, backticks
+_COMMAND_SYNTAX = re.compile(r"(^|\s)--?[A-Za-z][\w-]*|(^|\s)/\w|`")
+# Tube ou redirection entre deux mots (« ls | wc », « cat a >> b ») : syntaxe de commande
+# seulement si un programme connu est cité (« fichiers > 100 Mo » reste une question)
+_OPERATOR = re.compile(r"[\w.~/-]\s*(\|\|?|&&|2?>>?)\s*[\w.~/-]")
+# Préfixes ignorés pour trouver le programme d'une commande
+_PREFIXES = {"sudo", "env", "nohup", "time", "exec"}
+# Mots trop courts ou trop fréquents pour décider d'une route
+_STOPWORDS = {
+    "a", "an", "and", "the", "to", "of", "in", "on", "for", "how", "do", "i", "is", "with",
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "en", "pour", "comment", "je", "mon",
+    "ma", "mes", "dans", "sur", "avec", "est", "que", "qui", "quel", "quelle",
+}
+
+
+@dataclass
+class Route:
+    """Route choisie pour une question"""
+
+    name: str
+    alpha: float
+    reason: str
+
+    @property
+    def needs_embedding(self) -> bool:
+        return self.name != "keyword"
+
+
+def command_programs(command: str) -> set:
+    """Programmes appelés par une commande (premier mot de chaque segment du tube)"""
+    programs = set()
+    for segment in re.split(r"\||&&|;", command):
+        words = [word for word in segment.split() if word not in _PREFIXES and "=" not in word]
+        if words and re.fullmatch(r"[\w.+-]+", words[0]):
+            programs.add(words[0].lower())
+    return programs
+
+
+@dataclass
+class RouterVocabulary:
+    """Programmes connus et vocabulaire BM25 d'une collection
+
+    complete est faux pour un vocabulaire construit sur un échantillon : la route « vecteur seul »
+    (aucun terme commun avec l'index) n'est alors pas proposée.
+    """
+
+    programs: set = field(default_factory=set)
+    vocabulary: set = field(default_factory=set)
+    complete: bool = True
+
+    def update(self, records):
+        """Ajoute les propriétés (command, description) de nouveaux objets"""
+        for record in records:
+            command = record.get("command") or ""
+            self.programs |= command_programs(command)
+            self.vocabulary.update(tokenize(f"{command} {record.get('description') or ''}"))
+        return self
+
+    @classmethod
+    def from_collection(cls, collection, limit: int = 0):
+        """Parcours de la collection (à l'ingestion, ou limité à `limit` objets en arrière-plan)"""
+        objects = collection.iterator(return_properties=ROUTER_PROPERTIES, cache_size=1000)
+        if limit:
+            objects = itertools.islice(objects, limit + 1)
+        records = [obj.properties for obj in objects]
+        complete = not limit or len(records) <= limit
+        return cls(complete=complete).update(records[:limit or None])
+
+    @staticmethod
+    def path(collection_name: str, directory: str = DEFAULT_ROUTER_DIR) -> str:
+        return os.path.join(directory, f"{collection_name}.json")
+
+    @classmethod
+    def load(cls, collection_name: str, directory: str = DEFAULT_ROUTER_DIR):
+        """Vocabulaire enregistré, ou None si la collection n'en a pas encore"""
+        try:
+            with open(cls.path(collection_name, directory), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(set(data["programs"]), set(data["vocabulary"]), data.get("complete", True))
+
+    def save(self, collection_name: str, directory: str = DEFAULT_ROUTER_DIR):
+        """Écriture atomique : un moteur qui lit le fichier pendant l'ingestion voit l'ancienne ou la nouvelle version"""
+        os.makedirs(directory, exist_ok=True)
+        path = self.path(collection_name, directory)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"programs": sorted(self.programs), "vocabulary": sorted(self.vocabulary),
+                       "complete": self.complete}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def remove(cls, collection_name: str, directory: str = DEFAULT_ROUTER_DIR):
+        try:
+            os.remove(cls.path(collection_name, directory))
+        except FileNotFoundError:
+            pass
+
+
+class QueryRouter:
+    """Choisit la route et l'alpha de chaque question"""
+
+    def __init__(self, programs: set = frozenset(), vocabulary: set = None, alpha: float = 0.5,
+                 command_alpha: float = 0.3, keyword_max_words: int = 3):
+        self.programs = set(programs)
+        self.vocabulary = vocabulary
+        self.alpha = alpha
+        self.command_alpha = command_alpha
+        self.keyword_max_words = keyword_max_words
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        """Programmes connus et vocabulaire BM25 à partir des propriétés de la collection"""
+        return cls.from_vocabularies([RouterVocabulary().update(records)], **kwargs)
+
+    @classmethod
+    def from_vocabularies(cls, vocabularies: list, **kwargs):
+        """Routeur de collections fédérées ; un vocabulaire absent (None) ou partiel désactive la route vecteur"""
+        programs = set().union(*(vocabulary.programs for vocabulary in vocabularies if vocabulary))
+        vocabulary = None
+        if all(vocabulary is not None and vocabulary.complete for vocabulary in vocabularies):
+            vocabulary = set().union(*(vocabulary.vocabulary for vocabulary in vocabularies))
+        return cls(programs, vocabulary, **kwargs)
+
+    def route(self, question: str) -> Route:
+        tokens = tokenize(question)
+        words = [token for token in tokens if token not in _STOPWORDS]
+        mentioned = sorted(self.programs.intersection(words))
+
+        if _COMMAND_SYNTAX.search(question) or (mentioned and _OPERATOR.search(question)):
+            return Route("keyword", 0.0, "syntaxe de commande")
+        if mentioned and len(words) <= self.keyword_max_words:
+            return Route("keyword", 0.0, f"commande citée : {', '.join(mentioned)}")
+        if self.vocabulary is not None and words and not self.vocabulary.intersection(words):
+            # Aucun terme commun avec l'index : le score BM25 serait nul pour tous les objets
+            return Route("vector", 1.0, "aucun terme commun avec l'index BM25")
+        if mentioned:
+            return Route("hybrid", self.command_alpha, f"commande citée : {', '.join(mentioned)}")
+        return Route("hybrid", self.alpha, "question en langage naturel")
+
+
+class RouterStats:
+    """Part des questions par route et latence d'embedding évitée, thread-safe"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {name: 0 for name in ROUTES}
+        self.embed_seconds = 0.0
+        self.embed_calls = 0
+        self.saved_calls = 0
+
+    def record(self, route: Route, embed_seconds: float, cached: bool = False):
+        with self.lock:
+            self.counts[route.name] += 1
+            if route.needs_embedding:
+                if embed_seconds:
+                    self.embed_seconds += embed_seconds
+                    self.embed_calls += 1
+            elif not cached:
+                self.saved_calls += 1
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            total = sum(self.counts.values())
+            # Latence évitée estimée d'après la durée moyenne des embeddings réellement calculés
+            average = self.embed_seconds / self.embed_calls if self.embed_calls else 0.0
+            return {
+                "routes": dict(self.counts),
+                "shares": {name: count / total if total else 0.0 for name, count in self.counts.items()},
+                "embedding_calls_saved": self.saved_calls,
+                "latency_saved_ms": round(self.saved_calls * average * 1000, 1),
+            }
@@ -0,0 +1,137 @@
+"""
+Service de requêtes RAG résident
+Construit une seule fois les clients OpenAI (embeddings, LLM) et Weaviate,
+puis les réutilise pour toutes les questions
+"""
+
+import os
+import time
+import warnings
+
+_import_start = time.perf_counter()
+import weaviate
+from langchain_core.prompts import PromptTemplate
+from embedding_backends import EmbeddingBackend
+from embedding_cache import with_cache
+from llm_backends import LLMBackend
+from metrics import PipelineMetrics
+from rerank import make_reranker
+from answer_cache import AnswerCache
+from retrieval import DEFAULT_INDEX, INDEXES, RetrievalEngine
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+# Suppression des warnings non critiques
+warnings.filterwarnings("ignore", category=ResourceWarning)
+warnings.filterwarnings("ignore", message="Con004")
+os.environ["WEAVIATE_DISABLE_WARNINGS"] = "1"
+
+# Configuration Weaviate via variables d'environnement
+HOST = os.getenv("WEAVIATE_HOST", "wikiragweaviate")
+HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8080"))
+GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+DEFAULT_COLLECTION = os.getenv("WEAVIATE_DEFAULT_COLLECTION", "NewCollection")
+
+# Template de prompt personnalisé
+prompt_template = """
+Tu es un assistant Linux expert.
+Réponds avec une commande dans un bloc code + explication ultra courte.
+
+Question: {question}
+
+Contexte:
+{context}
+
+Réponds en français, concis.
+"""
+
+PROMPT = PromptTemplate(
+    template=prompt_template,
+    input_variables=["question", "context"]
+)
+
+
+class QueryService:
+    """Clients partagés entre les requêtes et réponse aux questions Linux"""
+
+    def __init__(self, index: str = DEFAULT_INDEX):
+        self.startup = {"imports": IMPORT_SECONDS}
+        self.index = index
+
+        start = time.perf_counter()
+        # Configuration Langchain (embeddings du backend EMBEDDING_BACKEND, derrière le cache de l'ingestion)
+        self.embedding_backend = EmbeddingBackend.from_env()
+        self.embeddings = with_cache(self.embedding_backend.create(), self.embedding_backend.signature)
+        # Configuration du LLM (backend LLM_BACKEND), prompts identiques simultanés regroupés
+        self.llm_backend = LLMBackend.from_env()
+        self.llm = self.llm_backend.create(temperature=0.0)
+        self.startup["langchain_clients"] = time.perf_counter() - start
+
+        # Reclassement des candidats (RAG_RERANK) : cross-encoder chargé et mesuré une fois ici
+        start = time.perf_counter()
+        self.reranker = make_reranker()
+        if self.reranker is not None:
+            self.startup["reranker"] = time.perf_counter() - start
+
+        # Connexion Weaviate v4 (inutile avec l'index local : établie à la première requête qui la demande)
+        self.client_db = None
+        if index == "weaviate":
+            start = time.perf_counter()
+            self._weaviate()
+            self.startup["weaviate_connect"] = time.perf_counter() - start
+        # Cache des réponses pour les questions répétées ou quasi identiques
+        self.answer_cache = AnswerCache.from_env()
+        # Métriques Prometheus (GET /metrics) et traces par étape (RAG_TRACING)
+        self.metrics = PipelineMetrics()
+        self.metrics.watch(self.embeddings, self.llm, self.answer_cache)
+        self.engines = {}
+        self.engine = self._engine(index)
+        self.startup["total"] = sum(self.startup.values())
+
+    def _weaviate(self):
+        if self.client_db is None:
+            self.client_db = weaviate.connect_to_custom(
+                http_host=HOST, http_port=HTTP_PORT, http_secure=False,
+                grpc_host=HOST, grpc_port=GRPC_PORT, grpc_secure=False,
+            )
+        return self.client_db
+
+    def _engine(self, index: str) -> RetrievalEngine:
+        """Moteur RAG par index (Weaviate ou index local), clients LLM et cache partagés"""
+        if index not in INDEXES:
+            raise ValueError(f"Index inconnu '{index}' (valeurs possibles : {', '.join(INDEXES)})")
+        if index not in self.engines:
+            if index == "local":
+                from local_index import LocalClient
+                client = LocalClient()
+            else:
+                client = self._weaviate()
+            self.engines[index] = RetrievalEngine(self.embeddings, self.llm, PROMPT, client=client,
+                                                  answer_cache=self.answer_cache,
+                                                  embedding_signature=self.embedding_backend.signature,
+                                                  metrics=self.metrics, reranker=self.reranker)
+        return self.engines[index]
+
+    def ask(self, question: str, collection_name: str = DEFAULT_COLLECTION, index: str = None) -> dict:
+        """Répond à une question à partir de la collection indiquée (durées par étape incluses)"""
+        engine = self._engine(index) if index else self.engine
+        return {**engine.ask(question, collection_name).to_dict(), "index": index or self.index}
+
+    def stats(self) -> dict:
+        return {
+            "startup_seconds": self.startup,
+            "index": self.index,
+            "embedding": self.embedding_backend.signature,
+            "llm": {"backend": self.llm_backend.description,
+                    **(self.llm.stats() if hasattr(self.llm, "stats") else {})},
+            "search": {"alpha": self.engine.alpha, "limit": self.engine.limit, "top_k": self.engine.top_k,
+                       "mmr_lambda": self.engine.mmr_lambda,
+                       "context_tokens": self.engine.context_builder.max_tokens},
+            "router": self.engine.router_stats.as_dict() if self.engine.routing else None,
+            "rerank": self.reranker.stats() if self.reranker else None,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+        }
+
+    def close(self):
+        if self.client_db is not None:
+            self.client_db.close()
+
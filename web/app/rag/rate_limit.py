@@ -0,0 +1,99 @@
+"""
+Limitation de débit pour les appels aux API d'embedding
+Token bucket requêtes/min et tokens/min + backoff exponentiel sur les erreurs 429
+"""
+
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Seau à jetons thread-safe, rechargé en continu à un débit par minute"""
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 1.0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Bloque jusqu'à disponibilité des jetons, retourne le temps d'attente
+
+        Une demande plus grosse que la capacité passe dès que le seau est plein
+        et laisse un solde négatif : le débit moyen reste respecté.
+        """
+        waited = 0.0
+        needed = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Combine un quota de requêtes/min et un quota de tokens/min (0 = illimité)"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens: int) -> float:
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens:
+            waited += self.tokens.acquire(tokens)
+        return waited
+
+
+def _status_code(exc: Exception):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """429 (quota dépassé) et erreurs 5xx transitoires de l'API"""
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return exc.__class__.__name__ in ("RateLimitError", "APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(exc: Exception):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(fn, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0,
+                      on_retry=None):
+    """Appelle fn() en réessayant avec un backoff exponentiel (avec jitter) sur les erreurs 429/5xx"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            delay = max(delay, _retry_after(e) or 0.0)
+            if on_retry:
+                on_retry(e, attempt + 1, delay)
+            time.sleep(delay)
+            attempt += 1
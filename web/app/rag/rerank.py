@@ -0,0 +1,150 @@
+"""
+Reclassement des candidats de la recherche hybride (RAG_RERANK)
+- cross-encoder : modèle sentence-transformers sur CPU, paires (question, source) notées par lots
+- lexical       : recouvrement des mots de la question, sans modèle (repli)
+Le cross-encoder est remplacé par le reclassement lexical quand il ferait dépasser
+le budget de latence de la requête (RAG_RERANK_BUDGET_MS) ou s'il est indisponible
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+from local_index import tokenize
+
+RERANKERS = ("off", "lexical", "cross-encoder")
+DEFAULT_RERANKER = os.getenv("RAG_RERANK", "off").lower()
+# Modèle multilingue : questions en français, commandes décrites en anglais
+DEFAULT_RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+# Durée maximale de la requête jusqu'aux sources (embedding + recherche + reclassement), 0 = sans limite
+DEFAULT_RERANK_BUDGET_MS = float(os.getenv("RAG_RERANK_BUDGET_MS", "250"))
+RERANK_BATCH_SIZE = int(os.getenv("RAG_RERANK_BATCH_SIZE", "32"))
+# Sources gardées après reclassement (0 = RAG_TOP_K) : un meilleur classement permet un contexte plus court
+DEFAULT_RERANK_TOP_K = int(os.getenv("RAG_RERANK_TOP_K", "0"))
+
+_WARM_UP = SimpleNamespace(properties={"command": "ls -la", "description": "list all files"})
+
+
+def _document(obj) -> str:
+    return f"{obj.properties.get('command', '')} {obj.properties.get('description', '')}"
+
+
+class LexicalReranker:
+    """Part des mots de la question présents dans la commande et sa description"""
+
+    name = "lexical"
+
+    def score(self, question: str, candidates: list) -> list:
+        terms = set(tokenize(question))
+        if not terms:
+            return [0.0] * len(candidates)
+        return [len(terms & set(tokenize(_document(obj)))) / len(terms) for obj in candidates]
+
+
+class CrossEncoderReranker:
+    """Cross-encoder chargé une fois, paires notées par lots sur tous les cœurs CPU"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise RuntimeError("Reclassement cross-encoder : pip install sentence-transformers") from e
+        import torch
+        torch.set_num_threads(os.cpu_count() or 1)
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def score(self, question: str, candidates: list) -> list:
+        pairs = [(question, _document(obj)) for obj in candidates]
+        return self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False).tolist()
+
+
+class Reranker:
+    """Reclasse les candidats dans le budget de latence ; top_k = sources gardées ensuite (None : celui du moteur)
+
+    Le coût par candidat de chaque reclasseur est suivi en moyenne glissante : avant chaque
+    requête, la durée prévue est comparée au temps restant dans le budget. À score égal,
+    l'ordre de la recherche hybride est conservé.
+    """
+
+    def __init__(self, primary, fallback=None, budget_ms: float = DEFAULT_RERANK_BUDGET_MS, top_k: int = None):
+        self.primary = primary
+        self.fallback = fallback if fallback is not None else LexicalReranker()
+        self.budget = budget_ms / 1000
+        self.top_k = top_k
+        self.lock = threading.Lock()
+        self.cost = {}
+        self.used = {}
+
+    @property
+    def name(self) -> str:
+        return self.primary.name
+
+    def warm_up(self, candidates: int = 8):
+        """Appels hors requête : initialisation paresseuse du modèle, puis première mesure du coût"""
+        self.primary.score("warm-up", [_WARM_UP] * candidates)
+        self._score(self.primary, "warm-up", [_WARM_UP] * candidates)
+
+    def _score(self, reranker, question: str, candidates: list) -> list:
+        start = time.perf_counter()
+        scores = reranker.score(question, candidates)
+        per_candidate = (time.perf_counter() - start) / len(candidates)
+        with self.lock:
+            previous = self.cost.get(reranker.name)
+            self.cost[reranker.name] = per_candidate if previous is None else 0.8 * previous + 0.2 * per_candidate
+        return scores
+
+    def _choose(self, count: int, elapsed: float):
+        if self.primary is self.fallback or not self.budget:
+            return self.primary
+        with self.lock:
+            estimate = self.cost.get(self.primary.name, 0.0) * count
+        return self.primary if elapsed + estimate <= self.budget else self.fallback
+
+    def rerank(self, question: str, candidates: list, elapsed: float = 0.0) -> tuple:
+        """(candidats reclassés, nom du reclasseur utilisé) ; elapsed = durée déjà écoulée de la requête"""
+        if len(candidates) <= 1:
+            return candidates, None
+        reranker = self._choose(len(candidates), elapsed)
+        try:
+            scores = self._score(reranker, question, candidates)
+        except Exception as e:
+            if reranker is self.fallback:
+                raise
+            print(f"⚠️  Reclassement {reranker.name} en erreur, repli {self.fallback.name} : {e}")
+            reranker = self.fallback
+            scores = self._score(reranker, question, candidates)
+        with self.lock:
+            self.used[reranker.name] = self.used.get(reranker.name, 0) + 1
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        return [candidates[i] for i in order], reranker.name
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"reranker": self.primary.name, "budget_ms": self.budget * 1000, "used": dict(self.used),
+                    "cost_ms_per_candidate": {name: round(cost * 1000, 3) for name, cost in self.cost.items()}}
+
+
+def make_reranker(name: str = DEFAULT_RERANKER, model: str = DEFAULT_RERANK_MODEL,
+                  budget_ms: float = DEFAULT_RERANK_BUDGET_MS, top_k: int = DEFAULT_RERANK_TOP_K):
+    """Reclasseur configuré (None si désactivé) ; sans sentence-transformers, repli lexical"""
+    if name not in RERANKERS:
+        raise ValueError(f"Reclasseur inconnu '{name}' (valeurs : {', '.join(RERANKERS)})")
+    if name == "off":
+        return None
+    primary = None
+    if name == "cross-encoder":
+        try:
+            primary = CrossEncoderReranker(model)
+        except Exception as e:
+            print(f"⚠️  Cross-encoder indisponible ({e}) : reclassement lexical")
+    if primary is None:
+        lexical = LexicalReranker()
+        return Reranker(lexical, lexical, budget_ms, top_k or None)
+    reranker = Reranker(primary, budget_ms=budget_ms, top_k=top_k or None)
+    reranker.warm_up()
+    return reranker
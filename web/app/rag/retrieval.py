@@ -0,0 +1,530 @@
+"""
+Moteur RAG partagé par le service de requêtes (03_query.py) et l'interface Gradio (04_gradio.py)
+embedding → recherche hybride → dédoublonnage → reclassement (facultatif) → génération,
+avec la durée de chaque étape.
+Les clients (embeddings, LLM, Weaviate sync/async) sont créés une fois et réutilisés.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import weaviate
+from answer_cache import collection_updated_at
+from context_builder import ContextBuilder
+from dedupe import merge_adjacent_chunks, select_sources, to_sources, unique_candidates
+from embedding_backends import check_signature, collection_signature, read_signature
+from federated import (
+    DEFAULT_TIMEOUT,
+    asearch_collections,
+    collection_names,
+    federation_name,
+    reciprocal_rank_fusion,
+    search_collections,
+)
+from query_router import ROUTER_PROPERTIES, ROUTER_SCAN_LIMIT, QueryRouter, Route, RouterStats, RouterVocabulary
+
+# Index interrogé : Weaviate, ou index local exporté par 08_export_local_index.py
+INDEXES = ("weaviate", "local")
+DEFAULT_INDEX = os.getenv("RAG_INDEX", "weaviate")
+
+# Paramètres de recherche par défaut
+DEFAULT_ALPHA = float(os.getenv("RAG_ALPHA", "0.5"))
+# Candidats demandés à Weaviate : les doublons sont éliminés dès l'ingestion (clé canonique),
+# il suffit d'une petite marge au-delà de top_k pour que MMR puisse diversifier
+DEFAULT_LIMIT = int(os.getenv("RAG_LIMIT", "6"))
+DEFAULT_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+# Compromis pertinence / diversité de MMR (RAG_MMR=0 : ordre de pertinence seul)
+DEFAULT_MMR_LAMBDA = (None if os.getenv("RAG_MMR", "1").lower() in ("0", "false", "no", "off")
+                      else float(os.getenv("RAG_MMR_LAMBDA", "0.5")))
+
+# Routage des questions (mots-clés / vecteur / hybride) : RAG_ROUTER=0 pour toujours utiliser l'hybride
+DEFAULT_ROUTING = os.getenv("RAG_ROUTER", "1").lower() not in ("0", "false", "no", "off")
+
+STAGES = ("embed", "search", "dedupe", "rerank", "generate")
+
+
+@dataclass
+class StageTimings:
+    """Durée de chaque étape d'une requête, en secondes"""
+
+    embed: float = 0.0
+    search: float = 0.0
+    dedupe: float = 0.0
+    rerank: float = 0.0
+    generate: float = 0.0
+    first_token: float = None
+    total: float = 0.0
+    started: float = field(default_factory=time.perf_counter, repr=False)
+    # Horodatage de début et intervalles (étape, début, fin) relatifs à `started`, pour les traces
+    started_at: float = field(default_factory=time.time, repr=False)
+    spans: list = field(default_factory=list, repr=False)
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def finish(self):
+        self.total = self.elapsed()
+
+    def as_dict(self) -> dict:
+        """Durées en millisecondes (format JSON)"""
+        data = {name: round(getattr(self, name) * 1000, 1) for name in STAGES}
+        data["total"] = round(self.total * 1000, 1)
+        if self.first_token is not None:
+            data["first_token"] = round(self.first_token * 1000, 1)
+        return data
+
+    def summary(self) -> str:
+        parts = [f"{name} {getattr(self, name) * 1000:.0f} ms" for name in STAGES]
+        if self.first_token is not None:
+            parts.append(f"premier token {self.first_token * 1000:.0f} ms")
+        return " · ".join(parts) + f" · total {self.total * 1000:.0f} ms"
+
+
+class _Stage:
+    """Chronomètre une étape et cumule sa durée dans StageTimings"""
+
+    def __init__(self, timings: StageTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        setattr(self.timings, self.name, getattr(self.timings, self.name) + end - self.start)
+        self.timings.spans.append((self.name, self.start - self.timings.started, end - self.timings.started,
+                                   exc[0] is not None))
+        return False
+
+
+@dataclass
+class RagAnswer:
+    """Réponse complète : texte généré, sources et durées par étape"""
+
+    question: str
+    collection: str
+    answer: str
+    sources: list
+    timings: StageTimings = field(default_factory=StageTimings)
+    cached: bool = False
+    route: Route = None
+    # Collections fédérées ignorées (délai dépassé ou erreur)
+    skipped: list = field(default_factory=list)
+    # Taille du prompt envoyé au LLM (None pour une réponse en cache)
+    prompt_tokens: int = None
+    context_tokens: int = None
+    completion_tokens: int = None
+    # Reclasseur appliqué aux candidats (cross-encoder, lexical en repli) ou None
+    reranker: str = None
+
+    def to_dict(self) -> dict:
+        return {
+            "question": self.question,
+            "collection": self.collection,
+            "answer": self.answer,
+            "sources": self.sources,
+            "cached": self.cached,
+            "route": self.route.name if self.route else None,
+            "route_reason": self.route.reason if self.route else None,
+            "skipped_collections": self.skipped,
+            "prompt_tokens": self.prompt_tokens,
+            "context_tokens": self.context_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reranker": self.reranker,
+            "seconds": self.timings.total,
+            "timings_ms": self.timings.as_dict(),
+        }
+
+
+class AsyncWeaviateClient:
+    """Client Weaviate async, connecté à la première utilisation
+
+    Le client async doit être créé dans la boucle d'événements qui l'utilise
+    (celle du serveur Gradio), d'où la connexion différée.
+    """
+
+    def __init__(self, host: str, http_port: int, grpc_port: int):
+        self.host = host
+        self.http_port = http_port
+        self.grpc_port = grpc_port
+        self.client = None
+        self._lock = None
+
+    async def collection(self, collection_name: str):
+        if self.client is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self.client is None:
+                    client = weaviate.use_async_with_custom(
+                        http_host=self.host, http_port=self.http_port, http_secure=False,
+                        grpc_host=self.host, grpc_port=self.grpc_port, grpc_secure=False,
+                    )
+                    await client.connect()
+                    self.client = client
+        return self.client.collections.get(collection_name)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+class RetrievalEngine:
+    """Chaîne RAG complète avec clients partagés, en versions synchrone et asynchrone"""
+
+    def __init__(self, embeddings, llm, prompt, client=None, async_client=None,
+                 alpha: float = DEFAULT_ALPHA, limit: int = DEFAULT_LIMIT, top_k: int = DEFAULT_TOP_K,
+                 mmr_lambda: float = DEFAULT_MMR_LAMBDA, answer_cache=None, routing: bool = DEFAULT_ROUTING,
+                 collection_timeout: float = DEFAULT_TIMEOUT, context_builder: ContextBuilder = None,
+                 embedding_signature: str = None, metrics=None, reranker=None):
+        self.embeddings = embeddings
+        self.llm = llm
+        self.prompt = prompt
+        self.client = client
+        self.async_client = async_client
+        self.alpha = alpha
+        self.limit = limit
+        self.top_k = top_k
+        self.mmr_lambda = mmr_lambda
+        self.answer_cache = answer_cache
+        self.routing = routing
+        self.routers = {}
+        # Parcours en arrière-plan des collections sans vocabulaire de routeur enregistré
+        self.router_scans = {}
+        self.router_stats = RouterStats()
+        self.collection_timeout = collection_timeout
+        self.context_builder = context_builder or ContextBuilder()
+        # Signature backend:modèle:dimension des embeddings, comparée à celle de chaque collection
+        self.embedding_signature = embedding_signature
+        self.checked = {}
+        # Métriques Prometheus et traces (metrics.PipelineMetrics), facultatives
+        self.metrics = metrics
+        # Reclassement des candidats (rerank.Reranker) à la place de MMR, facultatif
+        self.reranker = reranker
+        # Tâches de fond (vocabulaire du routeur), threads créés à la demande
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-background")
+
+    def _prompt(self, question: str, sources: list, answer: RagAnswer):
+        """Prompt dans le budget de tokens ; renseigne les sources retenues et la taille du prompt"""
+        context = self.context_builder.build(sources)
+        prompt = self.prompt.format(question=question, context=context.text)
+        answer.sources = context.sources
+        answer.context_tokens = context.tokens
+        answer.prompt_tokens = self.context_builder.count(prompt)
+        return prompt
+
+    def _from_cache(self, entry, question: str, collection_name: str, timings: StageTimings, route: Route):
+        timings.finish()
+        return RagAnswer(question, collection_name, entry["answer"], entry["sources"], timings,
+                         cached=True, route=route)
+
+    def _remember(self, answer: RagAnswer, question_embedding: list):
+        # Réponse partielle (collection ignorée) : pas mise en cache
+        if self.answer_cache is not None and not answer.skipped:
+            self.answer_cache.store(answer.collection, answer.question, question_embedding,
+                                    answer.answer, answer.sources)
+
+    def _finish(self, answer: RagAnswer) -> RagAnswer:
+        if not answer.cached and answer.prompt_tokens is not None:
+            answer.completion_tokens = self.context_builder.count(answer.answer)
+        self.router_stats.record(answer.route, answer.timings.embed, answer.cached)
+        if self.metrics is not None:
+            self.metrics.observe(answer)
+        return answer
+
+    # --- Routage ---
+
+    def _router_for(self, collection_name: str):
+        """Routeur en cache, reconstruit après une ingestion ou une suppression de la collection"""
+        entry = self.routers.get(collection_name)
+        if entry is not None and entry[1] >= collection_updated_at(collection_name):
+            return entry[0]
+        return None
+
+    def _build_router(self, collection_name: str, vocabularies: list) -> QueryRouter:
+        router = QueryRouter.from_vocabularies(vocabularies, alpha=self.alpha)
+        # Vocabulaire en cours de construction : routeur reconstruit à la question suivante
+        if all(vocabulary is not None for vocabulary in vocabularies):
+            self.routers[collection_name] = (router, time.time())
+        return router
+
+    def _scan_router_vocabulary(self, name: str):
+        """Collection ingérée sans vocabulaire enregistré : parcours limité à ROUTER_SCAN_LIMIT objets"""
+        try:
+            RouterVocabulary.from_collection(self.client.collections.get(name), ROUTER_SCAN_LIMIT).save(name)
+        except Exception as e:
+            print(f"⚠️  Vocabulaire du routeur pour '{name}' non construit : {e}")
+
+    async def _ascan_router_vocabulary(self, name: str):
+        try:
+            collection = await self.async_client.collection(name)
+            records = []
+            async for obj in collection.iterator(return_properties=ROUTER_PROPERTIES, cache_size=1000):
+                records.append(obj.properties)
+                if len(records) > ROUTER_SCAN_LIMIT:
+                    break
+            vocabulary = RouterVocabulary(complete=len(records) <= ROUTER_SCAN_LIMIT)
+            await asyncio.to_thread(vocabulary.update, records[:ROUTER_SCAN_LIMIT])
+            vocabulary.save(name)
+        except Exception as e:
+            print(f"⚠️  Vocabulaire du routeur pour '{name}' non construit : {e}")
+
+    def _router_vocabulary(self, name: str, start_scan):
+        """Vocabulaire enregistré à l'ingestion ; absent, il est construit en arrière-plan (une fois)"""
+        vocabulary = RouterVocabulary.load(name)
+        if vocabulary is None and name not in self.router_scans:
+            self.router_scans[name] = start_scan(name)
+        return vocabulary
+
+    def route(self, question: str, collection_name: str) -> Route:
+        if not self.routing:
+            return Route("hybrid", self.alpha, "routage désactivé")
+        router = self._router_for(collection_name)
+        if router is None:
+            vocabularies = []
+            for name in collection_names(collection_name):
+                collection = self.client.collections.get(name)
+                if hasattr(collection, "records"):
+                    vocabularies.append(RouterVocabulary().update(collection.records))
+                else:
+                    vocabularies.append(self._router_vocabulary(
+                        name, lambda name: self.executor.submit(self._scan_router_vocabulary, name)))
+            router = self._build_router(collection_name, vocabularies)
+        return router.route(question)
+
+    async def aroute(self, question: str, collection_name: str) -> Route:
+        if not self.routing:
+            return Route("hybrid", self.alpha, "routage désactivé")
+        router = self._router_for(collection_name)
+        if router is None:
+            vocabularies = []
+            for name in collection_names(collection_name):
+                collection = await self.async_client.collection(name)
+                if hasattr(collection, "index"):
+                    vocabularies.append(RouterVocabulary().update(collection.index.records))
+                else:
+                    vocabularies.append(self._router_vocabulary(
+                        name, lambda name: asyncio.create_task(self._ascan_router_vocabulary(name))))
+            router = self._build_router(collection_name, vocabularies)
+        return router.route(question)
+
+    # --- Compatibilité des embeddings ---
+
+    def _needs_check(self, collection_name: str) -> bool:
+        checked = self.checked.get(collection_name)
+        return bool(self.embedding_signature) and (checked is None or checked < collection_updated_at(collection_name))
+
+    def _check(self, collection_name: str, recorded: str):
+        check_signature(collection_name, recorded, self.embedding_signature)
+        self.checked[collection_name] = time.time()
+
+    def _collection(self, collection_name: str):
+        collection = self.client.collections.get(collection_name)
+        if self._needs_check(collection_name):
+            self._check(collection_name, collection_signature(collection))
+        return collection
+
+    async def _acollection(self, collection_name: str):
+        collection = await self.async_client.collection(collection_name)
+        if self._needs_check(collection_name):
+            if hasattr(collection, "index"):
+                recorded = collection.index.meta.get("embedding")
+            else:
+                recorded = read_signature((await collection.config.get()).description)
+            self._check(collection_name, recorded)
+        return collection
+
+    # --- Sélection des sources ---
+
+    def _select(self, question: str, objects: list, question_embedding: list, timings: StageTimings):
+        """Sources uniques, reclassées si un reclasseur est configuré, sinon diversifiées par MMR
+
+        Retourne (sources, reclasseur utilisé ou None). Le reclasseur voit tous les candidats uniques
+        et tient compte du temps déjà écoulé dans la requête pour respecter son budget.
+        """
+        if self.reranker is None:
+            with timings.stage("dedupe"):
+                return select_sources(objects, self.top_k, question_embedding, self.mmr_lambda), None
+        with timings.stage("dedupe"):
+            candidates = unique_candidates(merge_adjacent_chunks(objects))
+        with timings.stage("rerank"):
+            candidates, used = self.reranker.rerank(question, candidates, timings.elapsed())
+        return to_sources(candidates[:self.reranker.top_k or self.top_k]), used
+
+    # --- Chemin synchrone (service de requêtes, scripts) ---
+
+    def embed(self, question: str, timings: StageTimings) -> list:
+        with timings.stage("embed"):
+            return self.embeddings.embed_query(question)
+
+    def _query(self, collection, question: str, question_embedding: list, route: Route):
+        """Recherche BM25 seule (route keyword) ou hybride avec l'alpha de la route"""
+        if not route.needs_embedding:
+            return collection.query.bm25(query=question, limit=max(self.limit, self.top_k))
+        return collection.query.hybrid(
+            query=question,
+            vector=question_embedding,
+            alpha=route.alpha,
+            limit=max(self.limit, self.top_k),
+            include_vector=self.mmr_lambda is not None,
+        )
+
+    def search(self, question: str, question_embedding: list, collection_name: str,
+               timings: StageTimings, route: Route = None):
+        """Recherche puis dédoublonnage et reclassement ou MMR : (sources, collections ignorées, reclasseur)
+
+        Sur plusieurs collections ("A+B"), les recherches partent en parallèle avec le même
+        embedding et leurs classements sont fusionnés par RRF.
+        """
+        route = route or Route("hybrid", self.alpha, "")
+        names = collection_names(collection_name)
+        skipped = []
+        with timings.stage("search"):
+            if len(names) == 1:
+                objects = self._query(self._collection(names[0]), question,
+                                      question_embedding, route).objects
+            else:
+                results, skipped = search_collections(
+                    lambda name: self._query(self._collection(name), question,
+                                             question_embedding, route).objects,
+                    names, self.collection_timeout,
+                )
+                objects = reciprocal_rank_fusion(results)
+        sources, reranker = self._select(question, objects, question_embedding, timings)
+        return sources, skipped, reranker
+
+    def ask(self, question: str, collection_name) -> RagAnswer:
+        timings = StageTimings()
+        collection_name = federation_name(collection_name)
+        route = self.route(question, collection_name)
+        # Cache de réponses : question identique, puis question proche (nécessite l'embedding)
+        entry = None
+        if self.answer_cache:
+            entry = self.answer_cache.lookup(collection_name, question, final=not route.needs_embedding)
+        question_embedding = None
+        if entry is None and route.needs_embedding:
+            question_embedding = self.embed(question, timings)
+            if self.answer_cache:
+                entry = self.answer_cache.lookup_similar(collection_name, question_embedding)
+        if entry is not None:
+            return self._finish(self._from_cache(entry, question, collection_name, timings, route))
+
+        sources, skipped, reranker = self.search(question, question_embedding, collection_name, timings, route)
+        answer = RagAnswer(question, collection_name, "", sources, timings, route=route, skipped=skipped,
+                           reranker=reranker)
+        with timings.stage("generate"):
+            response = self.llm.invoke(self._prompt(question, sources, answer))
+        timings.finish()
+
+        answer.answer = response.content.strip()
+        self._remember(answer, question_embedding)
+        return self._finish(answer)
+
+    # --- Chemin asynchrone (Gradio) ---
+
+    async def aembed(self, question: str, timings: StageTimings) -> list:
+        with timings.stage("embed"):
+            return await self.embeddings.aembed_query(question)
+
+    async def asearch(self, question: str, question_embedding: list, collection_name: str,
+                      timings: StageTimings, route: Route = None):
+        route = route or Route("hybrid", self.alpha, "")
+        names = collection_names(collection_name)
+
+        async def query(name: str) -> list:
+            collection = await self._acollection(name)
+            return (await self._query(collection, question, question_embedding, route)).objects
+
+        skipped = []
+        with timings.stage("search"):
+            if len(names) == 1:
+                objects = await query(names[0])
+            else:
+                results, skipped = await asearch_collections(query, names, self.collection_timeout)
+                objects = reciprocal_rank_fusion(results)
+        if self.reranker is None:
+            sources, reranker = self._select(question, objects, question_embedding, timings)
+        else:
+            # Cross-encoder sur CPU : hors de la boucle d'événements, qui continue de servir les autres requêtes
+            sources, reranker = await asyncio.to_thread(self._select, question, objects, question_embedding, timings)
+        return sources, skipped, reranker
+
+    async def _aprepare(self, question: str, collection_name: str, timings: StageTimings):
+        """Route, cache de réponses et embedding : (route, RagAnswer en cache ou None, embedding ou None)
+
+        La recherche exacte évite tout appel ; la recherche par similarité nécessite
+        l'embedding de la question, réutilisé ensuite pour la recherche hybride.
+        """
+        route = await self.aroute(question, collection_name)
+        entry = None
+        if self.answer_cache:
+            entry = self.answer_cache.lookup(collection_name, question, final=not route.needs_embedding)
+        question_embedding = None
+        if entry is None and route.needs_embedding:
+            question_embedding = await self.aembed(question, timings)
+            if self.answer_cache:
+                entry = self.answer_cache.lookup_similar(collection_name, question_embedding)
+        if entry is not None:
+            return route, self._from_cache(entry, question, collection_name, timings, route), None
+        return route, None, question_embedding
+
+    async def aask(self, question: str, collection_name) -> RagAnswer:
+        timings = StageTimings()
+        collection_name = federation_name(collection_name)
+        route, cached, question_embedding = await self._aprepare(question, collection_name, timings)
+        if cached:
+            return self._finish(cached)
+        sources, skipped, reranker = await self.asearch(question, question_embedding, collection_name, timings, route)
+        answer = RagAnswer(question, collection_name, "", sources, timings, route=route, skipped=skipped,
+                           reranker=reranker)
+
+        with timings.stage("generate"):
+            response = await self.llm.ainvoke(self._prompt(question, sources, answer))
+        timings.finish()
+
+        answer.answer = response.content.strip()
+        self._remember(answer, question_embedding)
+        return self._finish(answer)
+
+    async def astream(self, question: str, collection_name):
+        """Produit ("sources", sources) dès la fin de la recherche, ("token", texte) au fil
+        de la génération, puis ("done", RagAnswer) avec les durées par étape
+        """
+        timings = StageTimings()
+        collection_name = federation_name(collection_name)
+        route, cached, question_embedding = await self._aprepare(question, collection_name, timings)
+        if cached:
+            # Réponse en cache : restituée d'un bloc
+            yield "sources", cached.sources
+            yield "token", cached.answer
+            yield "done", self._finish(cached)
+            return
+
+        sources, skipped, reranker = await self.asearch(question, question_embedding, collection_name, timings, route)
+        answer = RagAnswer(question, collection_name, "", sources, timings, route=route, skipped=skipped,
+                           reranker=reranker)
+        text = ""
+        # Une seule étape generate (construction du prompt comprise, comme ask/aask)
+        with timings.stage("generate"):
+            prompt = self._prompt(question, sources, answer)
+            yield "sources", answer.sources
+            async for chunk in self.llm.astream(prompt):
+                if not chunk.content:
+                    continue
+                if timings.first_token is None:
+                    timings.first_token = timings.elapsed()
+                text += chunk.content
+                yield "token", chunk.content
+        timings.finish()
+
+        answer.answer = text.strip()
+        self._remember(answer, question_embedding)
+        yield "done", self._finish(answer)
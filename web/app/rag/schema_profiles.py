@@ -0,0 +1,184 @@
+"""
+Profils de schéma Weaviate
+Réglages HNSW (ef, efConstruction, maxConnections, distance), compression des vecteurs
+(PQ, BQ, SQ, RQ) et index inversé / BM25, par profil prédéfini ou fichier YAML/JSON
+"""
+
+import copy
+import json
+import os
+from weaviate.classes.config import (
+    Configure,
+    DataType,
+    Property,
+    StopwordsPreset,
+    Tokenization,
+    VectorDistances,
+)
+
+# Profil par défaut : équivalent de Configure.VectorIndex.hnsw() sans paramètre
+PROFILES = {
+    "default": {
+        "description": "Réglages par défaut de Weaviate",
+        "vector_index": {},
+    },
+    "fast-ingest": {
+        "description": "Construction du graphe rapide, rappel légèrement moindre",
+        "vector_index": {"ef_construction": 64, "max_connections": 16, "ef": -1,
+                         "dynamic_ef_min": 64, "dynamic_ef_max": 256},
+    },
+    "high-recall": {
+        "description": "Graphe dense et recherche plus large, mémoire et latence accrues",
+        "vector_index": {"ef_construction": 256, "max_connections": 48, "ef": 256},
+    },
+    "low-memory": {
+        "description": "Vecteurs compressés (quantification binaire) avec rescoring, graphe léger",
+        "vector_index": {"ef_construction": 128, "max_connections": 16,
+                         "quantizer": {"type": "bq", "rescore_limit": 200}},
+    },
+}
+
+# Paramètres acceptés par section (les autres clés sont refusées pour éviter les fautes de frappe)
+VECTOR_INDEX_KEYS = {"distance", "ef", "ef_construction", "max_connections", "dynamic_ef_min",
+                     "dynamic_ef_max", "dynamic_ef_factor", "flat_search_cutoff",
+                     "vector_cache_max_objects", "cleanup_interval_seconds", "quantizer"}
+QUANTIZERS = {
+    "pq": Configure.VectorIndex.Quantizer.pq,
+    "bq": Configure.VectorIndex.Quantizer.bq,
+    "sq": Configure.VectorIndex.Quantizer.sq,
+    "rq": Configure.VectorIndex.Quantizer.rq,
+}
+INVERTED_INDEX_KEYS = {"bm25_b", "bm25_k1", "stopwords_preset", "stopwords_additions",
+                       "stopwords_removals", "index_property_length", "index_null_state",
+                       "index_timestamps", "cleanup_interval_seconds"}
+PROPERTY_KEYS = {"tokenization", "index_searchable", "index_filterable"}
+# Valeurs par défaut de Weaviate : BM25 se règle par paire (b et k1 ensemble)
+BM25_DEFAULTS = {"bm25_b": 0.75, "bm25_k1": 1.2}
+
+# Propriétés de la collection : texte recherché en BM25, clé canonique en correspondance exacte
+BASE_PROPERTIES = {
+    "command": {},
+    "description": {},
+    "command_key": {"tokenization": "field", "index_searchable": False},
+    # Documents découpés (02_ingest.py --chunk-tokens) : document parent et position du morceau
+    "parent_id": {"tokenization": "field", "index_searchable": False},
+    "chunk_index": {"data_type": "int"},
+}
+
+
+def _check_keys(section: str, values: dict, allowed: set):
+    unknown = set(values) - allowed
+    if unknown:
+        raise ValueError(f"Paramètre(s) inconnu(s) dans '{section}' : {', '.join(sorted(unknown))}")
+
+
+def load_profile(name_or_path: str) -> dict:
+    """Profil prédéfini par nom, ou fichier .yaml/.yml/.json"""
+    if name_or_path in PROFILES:
+        profile = copy.deepcopy(PROFILES[name_or_path])
+        profile["name"] = name_or_path
+        return profile
+    if not os.path.exists(name_or_path):
+        raise ValueError(f"Profil inconnu '{name_or_path}' (profils : {', '.join(PROFILES)}, ou fichier YAML/JSON)")
+
+    with open(name_or_path, encoding="utf-8") as f:
+        if name_or_path.endswith((".yaml", ".yml")):
+            import yaml
+            profile = yaml.safe_load(f) or {}
+        else:
+            profile = json.load(f)
+
+    # Un fichier peut partir d'un profil prédéfini ("extends") et n'en surcharger que quelques valeurs
+    base = copy.deepcopy(PROFILES.get(profile.pop("extends", "default"), PROFILES["default"]))
+    for section in ("vector_index", "inverted_index", "properties"):
+        base.setdefault(section, {}).update(profile.get(section) or {})
+    base["description"] = profile.get("description", name_or_path)
+    base["name"] = os.path.basename(name_or_path)
+    return base
+
+
+def vector_index_config(profile: dict):
+    settings = dict(profile.get("vector_index") or {})
+    _check_keys("vector_index", settings, VECTOR_INDEX_KEYS)
+    quantizer = settings.pop("quantizer", None)
+    if "distance" in settings:
+        settings["distance_metric"] = VectorDistances(settings.pop("distance"))
+    if quantizer:
+        quantizer = dict(quantizer)
+        kind = quantizer.pop("type", None)
+        if kind not in QUANTIZERS:
+            raise ValueError(f"Quantification inconnue '{kind}' (valeurs : {', '.join(QUANTIZERS)})")
+        settings["quantizer"] = QUANTIZERS[kind](**quantizer)
+    return Configure.VectorIndex.hnsw(**settings)
+
+
+def inverted_index_config(profile: dict):
+    settings = dict(profile.get("inverted_index") or {})
+    if not settings:
+        return None
+    _check_keys("inverted_index", settings, INVERTED_INDEX_KEYS)
+    if "stopwords_preset" in settings:
+        settings["stopwords_preset"] = StopwordsPreset(settings["stopwords_preset"])
+    # Un profil qui ne règle que b ou k1 garde la valeur par défaut de l'autre
+    if settings.keys() & BM25_DEFAULTS.keys():
+        settings = {**BM25_DEFAULTS, **settings}
+    return Configure.inverted_index(**settings)
+
+
+def properties_config(profile: dict) -> list:
+    overrides = profile.get("properties") or {}
+    _check_keys("properties", overrides, set(BASE_PROPERTIES))
+    properties = []
+    for name, defaults in BASE_PROPERTIES.items():
+        settings = {**defaults, **(overrides.get(name) or {})}
+        data_type = DataType(settings.pop("data_type", "text"))
+        _check_keys(f"properties.{name}", settings, PROPERTY_KEYS)
+        if "tokenization" in settings:
+            settings["tokenization"] = Tokenization(settings["tokenization"])
+        properties.append(Property(name=name, data_type=data_type, **settings))
+    return properties
+
+
+def collection_config(profile: dict) -> dict:
+    """Arguments de client.collections.create() pour le profil"""
+    config = {
+        "properties": properties_config(profile),
+        "vector_index_config": vector_index_config(profile),
+    }
+    inverted = inverted_index_config(profile)
+    if inverted is not None:
+        config["inverted_index_config"] = inverted
+    return config
+
+
+def estimate_memory(profile: dict, objects: int, dimensions: int) -> dict:
+    """Ordre de grandeur de la mémoire du conteneur Weaviate pour l'index vectoriel (octets)
+
+    Vecteurs gardés en mémoire (compressés si une quantification est active, les vecteurs
+    complets restant sur disque pour le rescoring) et liens du graphe HNSW de la couche 0.
+    """
+    settings = profile.get("vector_index") or {}
+    max_connections = settings.get("max_connections", 32)
+    quantizer = (settings.get("quantizer") or {}).get("type")
+    bytes_per_vector = {
+        None: dimensions * 4,
+        "sq": dimensions,
+        "rq": dimensions * (settings.get("quantizer") or {}).get("bits", 8) // 8,
+        "bq": dimensions // 8,
+        "pq": (settings.get("quantizer") or {}).get("segments") or dimensions // 4,
+    }[quantizer]
+    return {
+        "vectors": objects * bytes_per_vector,
+        "graph": objects * max_connections * 2 * 8,
+    }
+
+
+def describe(profile: dict) -> str:
+    settings = profile.get("vector_index") or {}
+    parts = [f"{key}={value}" for key, value in settings.items() if key != "quantizer"]
+    quantizer = settings.get("quantizer")
+    parts.append(f"quantification={quantizer['type'] if quantizer else 'aucune'}")
+    inverted = profile.get("inverted_index")
+    if inverted:
+        parts.extend(f"{key}={value}" for key, value in inverted.items())
+    return ", ".join(parts)
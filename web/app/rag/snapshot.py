@@ -0,0 +1,167 @@
+"""
+Instantanés de collections au format Parquet
+Objets et vecteurs lus par le curseur Weaviate et écrits par lots dans un fichier colonnaire
+(uuid, propriétés, vecteur float32 de taille fixe), puis rechargés par le batcher Weaviate
+sans aucun appel d'embedding
+"""
+
+import json
+import os
+import uuid as uuid_module
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshots")
+)
+# Métadonnées de l'instantané, dans le schéma Parquet
+METADATA_KEY = b"wikirag"
+
+
+def snapshot_path(collection_name: str, directory: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    return os.path.join(directory, f"{collection_name}.parquet")
+
+
+# Types Arrow des propriétés Weaviate : schéma fixé avant l'écriture, d'après la configuration de la collection
+_ARROW_TYPES = {
+    "text": pa.string(), "int": pa.int64(), "number": pa.float64(), "boolean": pa.bool_(),
+    "date": pa.timestamp("us", tz="UTC"), "uuid": pa.string(), "blob": pa.string(),
+}
+
+
+def _arrow_type(prop) -> pa.DataType:
+    data_type = str(getattr(prop.data_type, "value", prop.data_type))
+    item = data_type[:-2] if data_type.endswith("[]") else data_type
+    if item not in _ARROW_TYPES:
+        raise ValueError(f"Type de propriété non pris en charge par les instantanés : {data_type}")
+    return pa.list_(_ARROW_TYPES[item]) if data_type.endswith("[]") else _ARROW_TYPES[item]
+
+
+def _value(value):
+    """UUID Weaviate (uuid.UUID) enregistrés en texte"""
+    if isinstance(value, list):
+        return [_value(item) for item in value]
+    return str(value) if isinstance(value, uuid_module.UUID) else value
+
+
+def snapshot_schema(collection_properties: list, dimension: int) -> pa.Schema:
+    """Schéma de l'instantané d'après la configuration de la collection, pas d'après les premiers objets
+
+    Une propriété vide dans le premier lot garde ainsi son type pour les lots suivants.
+    """
+    fields = [pa.field("uuid", pa.string())]
+    fields += [pa.field(prop.name, _arrow_type(prop))
+               for prop in collection_properties]
+    fields.append(pa.field("vector", pa.list_(pa.float32(), dimension)))
+    return pa.schema(fields)
+
+
+def _record_batch(uuids: list, rows: list, vectors: list, schema: pa.Schema) -> pa.RecordBatch:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    columns = [pa.array(uuids, pa.string())]
+    for field in schema:
+        if field.name not in ("uuid", "vector"):
+            columns.append(pa.array([_value(row.get(field.name)) for row in rows], field.type))
+    columns.append(pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel()), matrix.shape[1]))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def export_snapshot(collection, path: str, metadata: dict = None, batch_rows: int = 5000,
+                    cache_size: int = 1000, compression: str = "zstd") -> dict:
+    """Écrit tous les objets d'une collection (propriétés et vecteurs) dans un fichier Parquet
+
+    Mémoire bornée à batch_rows objets ; le fichier est remplacé atomiquement en fin d'export.
+    Retourne les métadonnées enregistrées (nombre d'objets, dimension, propriétés…).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    collection_properties = collection.config.get().properties
+    properties = [prop.name for prop in collection_properties]
+    # Types vérifiés avant de lire le premier objet
+    for prop in collection_properties:
+        _arrow_type(prop)
+    metadata = dict(metadata or {})
+    writer = None
+    uuids, rows, vectors = [], [], []
+    count = 0
+    dimension = None
+
+    def flush():
+        nonlocal writer
+        if writer is None:
+            schema = snapshot_schema(collection_properties, dimension)
+            writer = pq.ParquetWriter(path + ".tmp", schema.with_metadata(
+                {METADATA_KEY: json.dumps(metadata, ensure_ascii=False)}), compression=compression)
+        writer.write_batch(_record_batch(uuids, rows, vectors, writer.schema))
+        uuids.clear()
+        rows.clear()
+        vectors.clear()
+
+    try:
+        for obj in collection.iterator(include_vector=True, return_properties=properties, cache_size=cache_size):
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            if not vector:
+                continue
+            if dimension is None:
+                dimension = len(vector)
+                # Dimension connue au premier objet : enregistrée avec le reste des métadonnées
+                metadata.update(properties=properties, dimension=dimension)
+            elif len(vector) != dimension:
+                raise ValueError(f"Dimension incohérente : {len(vector)} au lieu de {dimension}")
+            uuids.append(str(obj.uuid))
+            rows.append(obj.properties)
+            vectors.append(vector)
+            count += 1
+            if len(uuids) >= batch_rows:
+                flush()
+        if uuids:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError("Collection vide : aucun objet vectorisé à exporter")
+    os.replace(path + ".tmp", path)
+    metadata["count"] = count
+    return metadata
+
+
+def read_metadata(path: str) -> dict:
+    """Métadonnées d'un instantané (collection, signature d'embedding, dimension, propriétés) et nombre d'objets"""
+    parquet = pq.ParquetFile(path)
+    metadata = json.loads((parquet.schema_arrow.metadata or {}).get(METADATA_KEY, b"{}"))
+    metadata["count"] = parquet.metadata.num_rows
+    return metadata
+
+
+def iter_snapshot(path: str, batch_rows: int = 5000):
+    """Produit des lots (uuids, propriétés, matrice float32 des vecteurs) sans charger tout le fichier"""
+    parquet = pq.ParquetFile(path)
+    names = [name for name in parquet.schema_arrow.names if name not in ("uuid", "vector")]
+    for batch in parquet.iter_batches(batch_size=batch_rows):
+        vectors = batch.column("vector")
+        matrix = vectors.values.to_numpy(zero_copy_only=False).reshape(len(batch), vectors.type.list_size)
+        columns = {name: batch.column(name).to_pylist() for name in names}
+        rows = [{name: columns[name][i] for name in names if columns[name][i] is not None}
+                for i in range(len(batch))]
+        yield batch.column("uuid").to_pylist(), rows, matrix
+
+
+def import_snapshot(collection, path: str, batch_size: int = 500, concurrent_requests: int = 4,
+                    on_batch=None) -> tuple:
+    """Recharge un instantané via le batcher Weaviate (concurrent_requests requêtes en parallèle)
+
+    Les UUID d'origine sont conservés : réimporter le même fichier remplace les objets au lieu
+    de les dupliquer. on_batch(objets envoyés, propriétés du lot) est appelé après chaque lot.
+    Retourne (objets envoyés, objets rejetés par Weaviate).
+    """
+    written = 0
+    with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+        for uuids, rows, matrix in iter_snapshot(path):
+            for uuid, properties, vector in zip(uuids, rows, matrix):
+                batch.add_object(properties=properties, uuid=uuid, vector=vector.tolist())
+            written += len(uuids)
+            if on_batch:
+                on_batch(written, rows)
+    return written, collection.batch.failed_objects
@@ -0,0 +1,160 @@
+"""
+Sources de données de l'ingestion
+Dataset HuggingFace ou fichier local JSONL/CSV/Parquet, décrit par une spécification
+(source, split, correspondance des champs, gabarit du texte vectorisé) en YAML/JSON ou en options,
+lu en streaming : aucune source n'est chargée entièrement en mémoire
+"""
+
+import copy
+import csv
+import itertools
+import json
+import os
+import string
+from dataclasses import dataclass, field
+
+# Propriétés indispensables à la recherche et à l'affichage des sources (03/04)
+REQUIRED_FIELDS = ("command", "description")
+LOCAL_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+# Source historique : questions en anglais (input) et commandes Linux (output)
+DEFAULT_SPEC = {
+    "source": "hrsvrn/linux-commands-dataset",
+    "split": "train",
+    "fields": {"command": "output", "description": "input"},
+    "template": "{description}\n{command}",
+}
+
+
+def _lookup(item: dict, path: str):
+    """Valeur d'une colonne, éventuellement imbriquée (« meta.title »)"""
+    value = item
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+@dataclass
+class SourceSpec:
+    """Source d'ingestion et correspondance colonnes → propriétés de la collection"""
+
+    source: str
+    split: str = "train"
+    fields: dict = field(default_factory=lambda: dict(DEFAULT_SPEC["fields"]))
+    template: str = DEFAULT_SPEC["template"]
+    config: str = None
+    format: str = None
+
+    def __post_init__(self):
+        missing = [name for name in REQUIRED_FIELDS if name not in self.fields]
+        if missing:
+            raise ValueError(f"Champ(s) obligatoire(s) absent(s) de la correspondance : {', '.join(missing)}")
+        if "command_key" in self.fields:
+            raise ValueError("'command_key' est calculé à l'ingestion et ne peut pas être mappé")
+        # Le gabarit ne référence que des propriétés mappées (erreur dès le chargement, pas à la 10 000e ligne)
+        names = {name for _, name, _, _ in string.Formatter().parse(self.template) if name}
+        unknown = names - set(self.fields)
+        if unknown:
+            raise ValueError(f"Gabarit : propriété(s) non mappée(s) {', '.join(sorted(unknown))}")
+        if self.format is None:
+            self.format = LOCAL_FORMATS.get(os.path.splitext(self.source)[1].lower(), "hf")
+        elif self.format not in ("hf", *LOCAL_FORMATS.values()):
+            raise ValueError(f"Format inconnu '{self.format}' (valeurs : hf, jsonl, csv, parquet)")
+        if self.format != "hf" and not os.path.exists(self.source):
+            raise ValueError(f"Fichier source introuvable : {self.source}")
+
+    @property
+    def is_local(self) -> bool:
+        return self.format != "hf"
+
+    def fingerprint(self) -> dict:
+        """Identité de la source pour les points de reprise"""
+        return {"source": self.source, "split": None if self.is_local else self.split,
+                "config": self.config, "fields": self.fields, "template": self.template}
+
+    def describe(self) -> str:
+        origin = f"fichier {self.format}" if self.is_local else f"split '{self.split}'"
+        mapping = ", ".join(f"{prop}←{column}" for prop, column in self.fields.items())
+        return f"{self.source} ({origin}) · {mapping}"
+
+    def to_document(self, item: dict):
+        """(propriétés, texte à vectoriser) d'une ligne, ou None si un champ obligatoire est vide"""
+        properties = {}
+        for prop, column in self.fields.items():
+            value = _lookup(item, column)
+            properties[prop] = "" if value is None else str(value).strip()
+        if not all(properties[name] for name in REQUIRED_FIELDS):
+            return None
+        return properties, self.template.format_map(properties)
+
+    def iter_rows(self, start: int = 0, limit: int = 0):
+        """Lignes de la source à partir de `start` (au plus `limit`, 0 = toutes), lues au fil de l'eau"""
+        if self.format == "hf":
+            from datasets import load_dataset
+            rows = load_dataset(self.source, self.config, split=self.split, streaming=True)
+            if start:
+                rows = rows.skip(start)
+            if limit:
+                rows = rows.take(max(limit - start, 0))
+            return rows
+        rows = {"jsonl": _iter_jsonl, "csv": _iter_csv, "parquet": _iter_parquet}[self.format](self.source)
+        return itertools.islice(rows, start, limit or None)
+
+
+def _iter_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_csv(path: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_parquet(path: str, batch_rows: int = 5000):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        yield from batch.to_pylist()
+
+
+def parse_fields(pairs: list) -> dict:
+    """Options « propriété=colonne » → correspondance des champs"""
+    fields = {}
+    for pair in pairs or []:
+        prop, sep, column = pair.partition("=")
+        if not sep or not prop.strip() or not column.strip():
+            raise ValueError(f"Correspondance invalide '{pair}' (attendu : propriété=colonne)")
+        fields[prop.strip()] = column.strip()
+    return fields
+
+
+def load_source_spec(spec_path: str = None, source: str = None, split: str = None,
+                     fields: dict = None, template: str = None, config: str = None) -> SourceSpec:
+    """Spécification par défaut, ou fichier YAML/JSON, surchargée par les options de la ligne de commande"""
+    spec = copy.deepcopy(DEFAULT_SPEC)
+    if spec_path:
+        with open(spec_path, encoding="utf-8") as f:
+            if spec_path.endswith((".yaml", ".yml")):
+                import yaml
+                loaded = yaml.safe_load(f) or {}
+            else:
+                loaded = json.load(f)
+        unknown = set(loaded) - {"source", "split", "fields", "template", "config", "format"}
+        if unknown:
+            raise ValueError(f"Clé(s) inconnue(s) dans {spec_path} : {', '.join(sorted(unknown))}")
+        spec.update(loaded)
+    if source:
+        spec["source"] = source
+    if split:
+        spec["split"] = split
+    if fields:
+        spec["fields"] = {**spec["fields"], **fields}
+    if template:
+        spec["template"] = template.replace("\\n", "\n")
+    if config:
+        spec["config"] = config
+    return SourceSpec(**spec)
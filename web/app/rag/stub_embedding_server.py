@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Serveur d'embedding local compatible avec l'API OpenAI (/v1/embeddings)
+Retourne des vecteurs déterministes et simule latence et quotas (429) pour tester l'ingestion
+"""
+
+import argparse
+import base64
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from embedding_backends import hash_embedding
+
+
+class StubState:
+    """Compteurs et fenêtre glissante de requêtes pour simuler un quota"""
+
+    def __init__(self, dimensions: int, latency: float, rpm: int):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.rpm = rpm
+        self.calls = []
+        self.requests = 0
+        self.inputs = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.calls = [t for t in self.calls if now - t < 60]
+            if self.rpm and len(self.calls) >= self.rpm:
+                self.rejected += 1
+                return False
+            self.calls.append(now)
+            self.requests += 1
+            return True
+
+
+def make_handler(state: StubState):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, {
+                    "requests": state.requests,
+                    "inputs": state.inputs,
+                    "rejected": state.rejected,
+                })
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if not state.admit():
+                self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests"}},
+                                headers={"Retry-After": "1"})
+                return
+
+            inputs = request.get("input", [])
+            # Une chaîne seule, une liste de chaînes ou des listes de tokens (Langchain)
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            dimensions = request.get("dimensions") or state.dimensions
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            data = []
+            tokens = 0
+            for i, item in enumerate(inputs):
+                key = item if isinstance(item, str) else " ".join(str(t) for t in item)
+                tokens += len(item) if isinstance(item, list) else len(item.split())
+                vector = hash_embedding(key, dimensions)
+                if request.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+
+            with state.lock:
+                state.inputs += len(inputs)
+
+            self._send_json(200, {
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "stub"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+    return EmbeddingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur d'embedding factice compatible OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latence simulée par requête (s)")
+    parser.add_argument("--rpm", type=int, default=0, help="Quota de requêtes/min avant 429 (0 = illimité)")
+    args = parser.parse_args()
+
+    state = StubState(args.dimensions, args.latency, args.rpm)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"🧪 Serveur d'embedding factice sur http://{args.host}:{args.port}/v1")
+    print(f"   OPENAI_BASE_URL=http://{args.host}:{args.port}/v1 python 02_ingest.py ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 {state.requests} requêtes, {state.inputs} textes, {state.rejected} rejets 429")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()